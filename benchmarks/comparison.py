@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    benchmarks/comparison.py: Timing of snapshot comparisons
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+Usage: python benchmarks/comparison.py [SNAPSHOTS ...]
+
+Compares a dataset with SNAPSHOTS snapshots (default 1000, 2000, 5000 and 10000)
+against a target holding the older half of them. Merge, head, overlap tail and
+the ancestors of all snapshots are timed per backend. Times per snapshot stay
+constant if all operations are linear.
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from collections import OrderedDict
+import sys
+import time
+
+from abgleich.core.comparison import Comparison
+from abgleich.core.config import Config
+from abgleich.core.dataset import Dataset
+from abgleich.core.vector import VectorComparison, np
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+CONFIG = Config(
+    {
+        "source": {"zpool": "tank", "prefix": None, "host": "localhost", "user": None},
+        "target": {
+            "zpool": "backup",
+            "prefix": None,
+            "host": "localhost",
+            "user": None,
+        },
+    }
+)
+SIZES = (1000, 2000, 5000, 10000)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def dataset(side: str, root: str, count: int) -> Dataset:
+
+    entities = OrderedDict()
+    entities[f"{root:s}/data"] = [["type", "filesystem", "-"]]
+    for index in range(count):
+        entities[f"{root:s}/data@s{index:06d}"] = [
+            ["type", "snapshot", "-"],
+            ["guid", str(1000 + index), "-"],
+            ["createtxg", str(index), "-"],
+        ]
+
+    return Dataset.from_entities(f"{root:s}/data", entities, side, CONFIG)
+
+
+def timed(function) -> float:
+
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main(sizes):
+
+    backends = [Comparison] + ([] if np is None else [VectorComparison])
+
+    print(
+        f'{"backend":>16s} {"snapshots":>9s} '
+        f'{"merge":>10s} {"head":>10s} {"tail":>10s} {"ancestors":>10s}  (µs per snapshot)'
+    )
+
+    for count in sizes:
+        a = dataset("source", "tank", count)
+        b = dataset("target", "backup", count // 2)
+        for backend in backends:
+            comparison = None
+
+            def merge():
+                nonlocal comparison
+                comparison = backend.from_datasets(a, b)
+                list(comparison.merged)
+
+            times = (
+                timed(merge),
+                timed(lambda: comparison.a_head),
+                timed(lambda: comparison.a_overlap_tail),
+                timed(lambda: [snapshot.ancestor for snapshot in a.snapshots]),
+            )
+            print(
+                f"{backend.__name__:>16s} {count:9d} "
+                + " ".join(f"{duration / count * 1e6:10.3f}" for duration in times)
+            )
+
+
+if __name__ == "__main__":
+
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
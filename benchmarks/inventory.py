@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    benchmarks/inventory.py: Timing of inventory loading
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+Usage: python benchmarks/inventory.py [DATASETS ...]
+
+Loads the inventory of a zpool with DATASETS datasets (default 10, 20 and 40) of
+100 snapshots each through `Zpool.from_config`. A stand-in for `zfs`
+replays synthetic output, so no zpool is required. The full inventory
+(`zfs get all`, about 70 properties per entity) is compared with the targeted
+inventory of `backup` (`zfs list -o`). Output size, load time and load time per
+entity are reported. Times per entity stay constant if loading is linear.
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import os
+import sys
+import tempfile
+import time
+
+from abgleich.core.config import Config
+from abgleich.core.zpool import PROPERTIES, Zpool
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+CONFIG = Config(
+    {
+        "source": {"zpool": "tank", "prefix": None, "host": "localhost", "user": None},
+        "target": {
+            "zpool": "backup",
+            "prefix": None,
+            "host": "localhost",
+            "user": None,
+        },
+    }
+)
+SIZES = (10, 20, 40)
+SNAPSHOTS = 100
+
+# Properties reported by `zfs get all` for filesystems and snapshots
+ALL = (
+    "type creation used available referenced compressratio mounted quota "
+    "reservation recordsize mountpoint sharenfs checksum compression atime devices "
+    "exec setuid readonly zoned snapdir aclmode aclinherit createtxg canmount xattr "
+    "copies version utf8only normalization casesensitivity vscan nbmand sharesmb "
+    "refquota refreservation guid primarycache secondarycache usedbysnapshots "
+    "usedbydataset usedbychildren usedbyrefreservation logbias objsetid dedup "
+    "mlslabel sync dnodesize refcompressratio written logicalused logicalreferenced "
+    "volmode filesystem_limit snapshot_limit filesystem_count snapshot_count "
+    "snapdev acltype context fscontext defcontext rootcontext relatime "
+    "redundant_metadata overlay encryption keylocation keyformat pbkdf2iters "
+    "special_small_blocks defer_destroy userrefs"
+).split()
+VALUES = {
+    "compressratio": "1.50",
+    "encryption": "off",
+    "mountpoint": "/tank",
+    "refcompressratio": "1.50",
+}
+
+STANDIN = """#!/bin/sh
+case "$1" in
+    get) exec cat "{path:s}/get" ;;
+    list) exec cat "{path:s}/list" ;;
+esac
+exit 1
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def entities(datasets: int):
+
+    for dataset in range(datasets):
+        name = "tank" if dataset == 0 else f"tank/data{dataset:05d}"
+        yield name, "filesystem", dataset * (SNAPSHOTS + 1)
+        for snapshot in range(SNAPSHOTS):
+            yield f"{name:s}@s{snapshot:05d}", "snapshot", dataset * (
+                SNAPSHOTS + 1
+            ) + snapshot + 1
+
+
+def value(name: str, kind: str, index: int) -> str:
+
+    if name == "type":
+        return kind
+    if name in ("guid", "objsetid"):
+        return str(1000000 + index)
+    if name == "createtxg":
+        return str(index)
+    return VALUES.get(name, "4096")
+
+
+def write(path: str, datasets: int):
+
+    with open(os.path.join(path, "get"), "w") as f:
+        for name, kind, index in entities(datasets):
+            for prop in ALL:
+                f.write(f"{name:s}\t{prop:s}\t{value(prop, kind, index):s}\tdefault\n")
+
+    with open(os.path.join(path, "list"), "w") as f:
+        for name, kind, index in entities(datasets):
+            values = [value(prop, kind, index) for prop in PROPERTIES["backup"]]
+            f.write("\t".join([name, *values]) + "\n")
+
+    with open(os.path.join(path, "zfs"), "w") as f:
+        f.write(STANDIN.format(path=path))
+    os.chmod(os.path.join(path, "zfs"), 0o755)
+
+
+def timed(function) -> float:
+
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main(sizes):
+
+    print(
+        f'{"inventory":>10s} {"entities":>9s} {"MiB":>8s} {"seconds":>8s} '
+        f'{"µs per entity":>14s}'
+    )
+
+    with tempfile.TemporaryDirectory() as path:
+        os.environ["PATH"] = f'{path:s}{os.pathsep:s}{os.environ["PATH"]:s}'
+        for datasets in sizes:
+            write(path, datasets)
+            count = datasets * (SNAPSHOTS + 1)
+            for label, properties, output in (
+                ("get all", None, "get"),
+                ("list -o", PROPERTIES["backup"], "list"),
+            ):
+                duration = timed(
+                    lambda: Zpool.from_config("source", CONFIG, properties)
+                )
+                size = os.path.getsize(os.path.join(path, output)) / 2**20
+                print(
+                    f"{label:>10s} {count:9d} {size:8.2f} {duration:8.3f} "
+                    f"{duration / count * 1e6:14.3f}"
+                )
+
+
+if __name__ == "__main__":
+
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    benchmarks/transport.py: Throughput of data channels
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+Usage: python benchmarks/transport.py CONFIGFILE [MIB]
+
+Streams MIB MiB (default 256) of random data from the source to the target of
+CONFIGFILE through every available transport, i.e. `ssh`, `ssh+mbuffer` and
+`tcp` (if OpenBSD netcat is installed on both hosts), each with topology `relay`
+and, if both hosts are remote, `direct`. All other settings of the `transfer`
+section of CONFIGFILE apply, e.g. `address` or `compression`. As a local loopback
+stand-in, the same data is piped into a local process without any transport. It
+marks the upper bound of the measurement, i.e. the speed of generating and
+discarding data. The best of three runs is reported per transport.
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import sys
+import time
+
+from abgleich.core.command import Command
+from abgleich.core.config import Config
+from abgleich.core.connection import close_connections
+from abgleich.core.transport import TOPOLOGIES, TRANSPORTS, Transport
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+MIB = 256
+RUNS = 3
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def transports(config: Config):
+
+    remote = all((config[side]["host"] != "localhost" for side in ("source", "target")))
+
+    for transport in TRANSPORTS:
+        for topology in TOPOLOGIES:
+            if transport == "tcp" and topology == "direct":
+                continue  # always direct
+            if topology == "direct" and not remote:
+                continue
+            transfer = {
+                **config.get("transfer", {}),
+                "transport": transport,
+                "topology": topology,
+            }
+            try:
+                yield Transport.from_config(Config({**config, "transfer": transfer}))
+            except ValueError as error:  # e.g. netcat is not compatible
+                print(f"{transport:s} skipped: {str(error):s}")
+
+
+def best(transfer) -> float:
+
+    durations = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        transfer()
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
+
+
+def main(path: str, size: int):
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = Config.from_fd(f)
+
+    generate = ["head", "-c", str(size), "/dev/urandom"]
+    discard = ["sh", "-c", "cat > /dev/null"]
+
+    results = [
+        (
+            "loopback",
+            best(lambda: Command(generate).run_pipe(Command(discard))),
+        )
+    ]
+    for transport in transports(config):
+        try:
+            duration = best(
+                lambda: transport.probe(
+                    Command.on_side(generate, "source", config),
+                    Command.on_side(discard, "target", config),
+                )
+            )
+        except SystemError as error:  # e.g. mbuffer is not installed
+            errors = " ".join(" ".join(error.args[2:]).split())
+            print(f"{str(transport):s} failed: {errors:s}")
+            continue
+        results.append((str(transport), duration))
+    close_connections()
+
+    print(f'{"transport":>22s} {"seconds":>8s} {"MiB/s":>8s} {"loopback":>9s}')
+    for name, duration in results:
+        print(
+            f"{name:>22s} {duration:8.3f} {size / duration / 2**20:8.1f} "
+            f"{results[0][1] / duration:9.1%}"
+        )
+
+
+if __name__ == "__main__":
+
+    main(sys.argv[1], (int(sys.argv[2]) if len(sys.argv) > 2 else MIB) * 2**20)
@@ -73,8 +73,9 @@ with open(os.path.join(SRC_DIR, "abgleich", "__init__.py"), "r", encoding="utf-8
 
 # Requirements
 extras_require = {
-    "dev": ["black", "python-language-server[all]", "setuptools", "twine", "wheel",],
+    "dev": ["black", "pytest", "python-language-server[all]", "setuptools", "twine", "wheel",],
     "gui": ["pyqt5",],
+    "numpy": ["numpy",],
 }
 extras_require["all"] = list(
     {rq for target in extras_require.keys() for rq in extras_require[target]}
@@ -34,8 +34,11 @@ import sys
 
 from ..core.config import Config
 from ..core.i18n import t
-from ..core.lib import is_host_up
-from ..core.zpool import Zpool
+from ..core.lib import is_host_up, measure_throughput
+from ..core.scheduler import Scheduler
+from ..core.transaction import TransactionList
+from ..core.transport import Transport
+from ..core.zpool import PROPERTIES, Zpool
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
@@ -44,7 +47,13 @@ from ..core.zpool import Zpool
 
 @click.command(short_help="backup a dataset tree into another")
 @click.argument("configfile", type=click.File("r", encoding="utf-8"))
-def backup(configfile):
+@click.option(
+    "--yes",
+    "-y",
+    is_flag=True,
+    help="do not ask for confirmation, start transfers while planning",
+)
+def backup(configfile, yes):
 
     config = Config.from_fd(configfile)
 
@@ -53,16 +62,55 @@ def backup(configfile):
             print(f'{t("host is not up"):s}: {side:s}')
             sys.exit(1)
 
-    source_zpool = Zpool.from_config("source", config=config)
-    target_zpool = Zpool.from_config("target", config=config)
+    Transport.from_config(config)  # fails early, e.g. without a compatible netcat
+
+    source_zpool, target_zpool, _ = Zpool.from_config_pair(
+        config=config, properties=PROPERTIES["backup"]
+    )
+
+    if yes:
+        Scheduler.from_config(config).run_stream(
+            _generate_batches(
+                source_zpool, target_zpool, jobs=config["source"].get("jobs", 4)
+            )
+        )
+        source_zpool.print_conflicts()
+        if len(source_zpool.conflicts) > 0:
+            sys.exit(1)
+        return
 
     transactions = source_zpool.get_backup_transactions(target_zpool)
+    source_zpool.print_conflicts()
 
     if len(transactions) == 0:
         print(t("nothing to do"))
+        if len(source_zpool.conflicts) > 0:
+            sys.exit(1)
         return
     transactions.print_table()
 
+    probe_size = config.get("probe_size", 0)
+    transactions.print_estimate(
+        measure_throughput(config, probe_size) if probe_size > 0 else None
+    )
+
     click.confirm(t("Do you want to continue?"), abort=True)
 
-    transactions.run()
+    Scheduler.from_config(config).run(transactions)
+
+    if len(source_zpool.conflicts) > 0:
+        sys.exit(1)
+
+
+def _generate_batches(source_zpool, target_zpool, jobs):
+
+    gen = source_zpool.generate_backup_transactions(target_zpool)
+    _ = next(gen)  # number of datasets
+
+    for _, transactions in gen:
+        if transactions is None:
+            continue
+        transaction_list = TransactionList()
+        transaction_list.extend(transactions)
+        transaction_list.estimate(jobs=jobs)
+        yield from transaction_list.batches
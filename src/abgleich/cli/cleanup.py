@@ -38,7 +38,7 @@ from ..core.config import Config
 from ..core.i18n import t
 from ..core.io import humanize_size
 from ..core.lib import is_host_up
-from ..core.zpool import Zpool
+from ..core.zpool import PROPERTIES, Zpool
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
@@ -56,14 +56,17 @@ def cleanup(configfile):
             print(f'{t("host is not up"):s}: {side:s}')
             sys.exit(1)
 
-    source_zpool = Zpool.from_config("source", config=config)
-    target_zpool = Zpool.from_config("target", config=config)
-    available_before = Zpool.available("source", config=config)
+    source_zpool, target_zpool, available_before = Zpool.from_config_pair(
+        config=config, properties=PROPERTIES["cleanup"], available=True
+    )
 
     transactions = source_zpool.get_cleanup_transactions(target_zpool)
+    source_zpool.print_conflicts()
 
     if len(transactions) == 0:
         print(t("nothing to do"))
+        if len(source_zpool.conflicts) > 0:
+            sys.exit(1)
         return
     transactions.print_table()
 
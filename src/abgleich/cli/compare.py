@@ -35,7 +35,7 @@ import sys
 from ..core.config import Config
 from ..core.i18n import t
 from ..core.lib import is_host_up
-from ..core.zpool import Zpool
+from ..core.zpool import PROPERTIES, Zpool
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
@@ -53,7 +53,8 @@ def compare(configfile):
             print(f'{t("host is not up"):s}: {side:s}')
             sys.exit(1)
 
-    source_zpool = Zpool.from_config("source", config=config)
-    target_zpool = Zpool.from_config("target", config=config)
+    source_zpool, target_zpool, _ = Zpool.from_config_pair(
+        config=config, properties=PROPERTIES["compare"]
+    )
 
     source_zpool.print_comparison_table(target_zpool)
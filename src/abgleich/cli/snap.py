@@ -35,7 +35,7 @@ import sys
 from ..core.config import Config
 from ..core.i18n import t
 from ..core.lib import is_host_up
-from ..core.zpool import Zpool
+from ..core.zpool import PROPERTIES, Zpool
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
@@ -52,7 +52,7 @@ def snap(configfile):
         print(f'{t("host is not up"):s}: source')
         sys.exit(1)
 
-    zpool = Zpool.from_config("source", config=config)
+    zpool = Zpool.from_config("source", config=config, properties=PROPERTIES["snap"])
     transactions = zpool.get_snapshot_transactions()
 
     if len(transactions) == 0:
@@ -35,7 +35,7 @@ import sys
 from ..core.config import Config
 from ..core.i18n import t
 from ..core.lib import is_host_up
-from ..core.zpool import Zpool
+from ..core.zpool import PROPERTIES, Zpool
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
@@ -53,5 +53,5 @@ def tree(configfile, side):
         print(f'{t("host is not up"):s}: {side:s}')
         sys.exit(1)
 
-    zpool = Zpool.from_config(side, config=config)
+    zpool = Zpool.from_config(side, config=config, properties=PROPERTIES["tree"])
     zpool.print_table()
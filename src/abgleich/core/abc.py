@@ -55,6 +55,10 @@ class ConfigABC(abc.ABC):
     pass
 
 
+class ConnectionABC(abc.ABC):
+    pass
+
+
 class DatasetABC(abc.ABC):
     pass
 
@@ -63,6 +67,14 @@ class PropertyABC(abc.ABC):
     pass
 
 
+class SchedulerABC(abc.ABC):
+    pass
+
+
+class SendProfileABC(abc.ABC):
+    pass
+
+
 class SnapshotABC(abc.ABC):
     pass
 
@@ -79,5 +91,13 @@ class TransactionMetaABC(abc.ABC):
     pass
 
 
+class TransactionProgressABC(abc.ABC):
+    pass
+
+
+class TransportABC(abc.ABC):
+    pass
+
+
 class ZpoolABC(abc.ABC):
     pass
@@ -28,40 +28,76 @@ specific language governing rights and limitations under the License.
 # IMPORT
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+import fcntl
+import os
 import subprocess
+import threading
 import typing
 
 import typeguard
 
-from .abc import CommandABC
+from .abc import CommandABC, ConnectionABC
+from .connection import SSHConnection, get_connection
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+RELAY_CHUNK = 1 << 20  # bytes moved per system call when relaying pipes
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 
+class CommandError(SystemError):
+    """
+    Raised if a command fails. Its arguments are the message, the command, its
+    output and its errors, which are also exposed by name.
+    """
+
+    def __init__(self, message: str, command: str, output: str, errors: str):
+
+        super().__init__(message, command, output, errors)
+        self.command, self.output, self.errors = command, output, errors
+
+
 @typeguard.typechecked
 class Command(CommandABC):
-    def __init__(self, cmd: typing.List[str]):
+    def __init__(
+        self,
+        cmd: typing.List[str],
+        connection: typing.Union[None, ConnectionABC] = None,
+    ):
 
         self._cmd = cmd.copy()
+        self._connection = connection
 
     def __str__(self) -> str:
 
         return " ".join([item.replace(" ", "\\ ") for item in self._cmd])
 
     def run(
-        self, returncode: bool = False
+        self,
+        returncode: bool = False,
+        started: typing.Union[None, typing.Callable[[subprocess.Popen], None]] = None,
     ) -> typing.Union[typing.Tuple[str, str], typing.Tuple[str, str, int, Exception]]:
+        """
+        Runs command and returns its output and errors. `started` is called with
+        the process once it is running, e.g. so it can be killed by another thread.
+        """
 
+        self.connect()
         proc = subprocess.Popen(
             self.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
         )
+        if started is not None:
+            started(proc)
         output, errors = proc.communicate()
         status = not bool(proc.returncode)
         output, errors = output.decode("utf-8"), errors.decode("utf-8")
 
-        exception = SystemError("command failed", str(self), output, errors)
+        exception = CommandError("command failed", str(self), output, errors)
 
         if returncode:
             return output, errors, int(proc.returncode), exception
@@ -71,25 +107,116 @@ class Command(CommandABC):
 
         return output, errors
 
-    def run_pipe(self, other: CommandABC):
-
-        proc_1 = subprocess.Popen(
+    def run_stream(
+        self, chunk_size: int = 65536
+    ) -> typing.Generator[bytes, None, None]:
+        """
+        Runs command and yields its output line by line (as bytes) while it is being
+        produced. Output is never held in memory as a whole. If the generator is closed
+        early, the command is killed. If the command returns a non-zero exit code,
+        `CommandError` is raised once its output has been consumed.
+        """
+
+        self.connect()
+        proc = subprocess.Popen(
             self.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
         )
+        errors = []
+        drain = threading.Thread(
+            target=self._drain, args=(proc.stderr, errors), daemon=True
+        )
+        drain.start()
+
+        complete = False
+        try:
+            rest = b""
+            while True:
+                chunk = proc.stdout.read1(chunk_size)
+                if len(chunk) == 0:
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                yield from lines
+            if len(rest) > 0:
+                yield rest
+            complete = True
+        finally:
+            if not complete:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+            drain.join()
+
+        if proc.returncode != 0:
+            errors = b"".join(errors).decode("utf-8")
+            raise CommandError("command failed", str(self), "", errors)
+
+    @staticmethod
+    def _drain(stream: typing.BinaryIO, chunks: typing.List[bytes]):
+
+        for chunk in iter(lambda: stream.read(65536), b""):
+            chunks.append(chunk)
+        stream.close()
+
+    def run_pipe(
+        self,
+        other: CommandABC,
+        progress: typing.Union[None, typing.Callable[[int], None]] = None,
+    ) -> typing.Tuple[str, str, str]:
+        """
+        Streams the output of this command into the input of another command,
+        e.g. `zfs send` into `zfs receive`. Data is relayed in chunks of
+        `RELAY_CHUNK` bytes, `progress` is called with the number of bytes of
+        every chunk. All other streams are drained concurrently, so neither
+        command can stall the pipe by filling up its stderr.
+        """
+
+        self.connect()
+        other.connect()
+        proc_1 = subprocess.Popen(
+            self.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0
+        )
         proc_2 = subprocess.Popen(
             other.cmd,
-            stdin=proc_1.stdout,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
+            bufsize=0,
         )
 
-        output_2, errors_2 = proc_2.communicate()
-        status_2 = not bool(proc_2.returncode)
-        _, errors_1 = proc_1.communicate()
-        status_1 = not bool(proc_1.returncode)
+        errors_1, output_2, errors_2 = [], [], []
+        drains = [
+            threading.Thread(target=self._drain, args=(stream, chunks), daemon=True)
+            for stream, chunks in (
+                (proc_1.stderr, errors_1),
+                (proc_2.stdout, output_2),
+                (proc_2.stderr, errors_2),
+            )
+        ]
+        for drain in drains:
+            drain.start()
+
+        try:
+            self._relay(proc_1.stdout, proc_2.stdin, progress)
+        except BrokenPipeError:  # receiver has quit, sender will be told by SIGPIPE
+            pass
+        finally:
+            proc_1.stdout.close()
+            try:
+                proc_2.stdin.close()  # EOF for receiver
+            except BrokenPipeError:
+                pass
+
+        proc_1.wait()
+        proc_2.wait()
+        for drain in drains:
+            drain.join()
 
-        errors_1 = errors_1.decode("utf-8")
-        output_2, errors_2 = output_2.decode("utf-8"), errors_2.decode("utf-8")
+        status_1 = not bool(proc_1.returncode)
+        status_2 = not bool(proc_2.returncode)
+        errors_1 = b"".join(errors_1).decode("utf-8")
+        output_2 = b"".join(output_2).decode("utf-8")
+        errors_2 = b"".join(errors_2).decode("utf-8")
 
         if any(
             (
@@ -109,34 +236,113 @@ class Command(CommandABC):
 
         return errors_1, output_2, errors_2
 
+    @staticmethod
+    def _relay(
+        source: typing.BinaryIO,
+        destination: typing.BinaryIO,
+        progress: typing.Union[None, typing.Callable[[int], None]] = None,
+    ):
+        """
+        Moves all data from one pipe to another. Uses `os.splice` where available
+        (Linux, Python 3.10+), which keeps data in kernel space. Otherwise, data is
+        copied through one reusable buffer.
+        """
+
+        source, destination = source.fileno(), destination.fileno()
+
+        if hasattr(fcntl, "F_SETPIPE_SZ"):  # Linux, Python 3.10+
+            for fd in (source, destination):
+                try:
+                    fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, RELAY_CHUNK)
+                except OSError:  # exceeds /proc/sys/fs/pipe-max-size
+                    pass
+
+        if hasattr(os, "splice"):
+            while True:
+                length = os.splice(source, destination, RELAY_CHUNK)
+                if length == 0:
+                    return
+                if progress is not None:
+                    progress(length)
+
+        buffer = bytearray(RELAY_CHUNK)
+        view = memoryview(buffer)
+
+        while True:
+            length = os.readv(source, (buffer,))
+            if length == 0:
+                return
+            offset = 0
+            while offset < length:
+                offset += os.write(destination, view[offset:length])
+            if progress is not None:
+                progress(length)
+
     @property
-    def cmd(self) -> typing.List[str]:
+    def args(self) -> typing.List[str]:
 
         return self._cmd.copy()
 
+    @property
+    def cmd(self) -> typing.List[str]:
+        """
+        Command as run, i.e. wrapped for its connection. Does not open connections,
+        see `Command.connect`.
+        """
+
+        if self._connection is None:
+            return self._cmd.copy()
+        return self._connection.wrap(self._cmd)
+
+    @property
+    def connection(self) -> typing.Union[None, ConnectionABC]:
+
+        return self._connection
+
+    def connect(self):
+        """
+        Opens the connection of this command if it is not open yet, so the
+        command uses a shared connection if available. Called by all `run*`
+        methods.
+        """
+
+        if self._connection is not None:
+            self._connection.connect()
+
+    @classmethod
+    def join(cls, commands: typing.List[CommandABC]) -> CommandABC:
+        """
+        Merges commands which only differ in their last argument into one,
+        e.g. `zfs snapshot a@x` and `zfs snapshot b@y` into `zfs snapshot a@x b@y`.
+        """
+
+        assert len(commands) > 0
+        prefix = commands[0].args[:-1]
+        assert all((command.args[:-1] == prefix for command in commands))
+        assert all(
+            (command.connection is commands[0].connection for command in commands)
+        )
+
+        return cls(
+            prefix + [command.args[-1] for command in commands],
+            connection=commands[0].connection,
+        )
+
     @classmethod
     def on_side(
         cls, cmd: typing.List[str], side: str, config: typing.Dict
     ) -> CommandABC:
 
-        if config[side]["host"] == "localhost":
-            return cls(cmd)
-        return cls.with_ssh(cmd, side_config=config[side], ssh_config=config["ssh"])
+        return cls(cmd, connection=get_connection(side, config))
 
     @classmethod
     def with_ssh(
         cls, cmd: typing.List[str], side_config: typing.Dict, ssh_config: typing.Dict
     ) -> CommandABC:
 
-        cmd_str = " ".join([item.replace(" ", "\\ ") for item in cmd])
-        cmd = [
-            "ssh",
-            "-T",  # Disable pseudo-terminal allocation
-            "-o",
-            "Compression=yes" if ssh_config["compression"] else "Compression=no",
-        ]
-        if ssh_config["cipher"] is not None:
-            cmd.extend(("-c", ssh_config["cipher"]))
-        cmd.extend([f'{side_config["user"]:s}@{side_config["host"]:s}', cmd_str])
-
-        return cls(cmd)
+        return cls(
+            cmd,
+            connection=SSHConnection(
+                "remote", side_config=side_config, ssh_config=ssh_config
+            ),
+        )
@@ -51,14 +51,27 @@ ComparisonItemType = typing.Union[
 ComparisonStrictItemType = typing.Union[
     DatasetABC, SnapshotABC,
 ]
+ComparisonKeyTypes = typing.Union[
+    str, int,
+]
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 
+class ConflictError(ValueError):
+    """
+    Raised if the snapshots of a dataset have diverged between both sides. Only
+    this dataset can not be compared, all others are not affected.
+    """
+
+
 @typeguard.typechecked
 class Comparison(ComparisonABC):
+
+    SELECTIONS = ("a", "a_head", "a_overlap_tail", "b", "b_head", "b_overlap_tail")
+
     def __init__(
         self,
         a: ComparisonParentTypes,
@@ -123,6 +136,25 @@ class Comparison(ComparisonABC):
 
         return (item for item in self._merged)
 
+    def get_sum(self, name: str, selection: str) -> int:
+        """
+        Sum of an integer property, e.g. `used` or `written`, of a selection of
+        elements, i.e. of one side (`a`, `b`), its head or its overlap tail.
+        """
+
+        assert selection in self.SELECTIONS
+
+        if selection in ("a", "b"):
+            elements = [
+                getattr(item, selection)
+                for item in self._merged
+                if getattr(item, selection) is not None
+            ]
+        else:
+            elements = getattr(self, selection)
+
+        return sum((element[name].value for element in elements))
+
     @classmethod
     def _head(
         cls,
@@ -133,6 +165,7 @@ class Comparison(ComparisonABC):
         Returns new elements from source.
         If target is empty, returns source.
         If head of target and head of source are identical, returns empty list.
+        Raises `ConflictError` if target has diverged from source.
         """
 
         source, target = cls._strip_none(source), cls._strip_none(target)
@@ -142,32 +175,36 @@ class Comparison(ComparisonABC):
         if any((element is None for element in target)):
             raise ValueError("target is not consecutive")
 
-        if len(source) == 0:
-            raise ValueError("source must not be empty")
+        identity = cls._identity(source + target)
+        source_keys = [identity(element) for element in source]
+        target_keys = [identity(element) for element in target]
+        source_positions = cls._positions(source_keys)
 
-        if len(set([item.name for item in source])) != len(source):
+        if len(source_positions) != len(source):
             raise ValueError("source contains doublicate entires")
-        if len(set([item.name for item in target])) != len(target):
+        if len(cls._positions(target_keys)) != len(target):
             raise ValueError("target contains doublicate entires")
 
         if len(target) == 0:
             return source  # all of source, target is empty
 
-        try:
-            source_index = [item.name for item in source].index(target[-1].name)
-        except ValueError:
-            raise ValueError("last target element not in source")
+        source_index = source_positions.get(target_keys[-1])
+        if source_index is None:
+            raise ConflictError("last target element not in source")
 
-        old_source = source[: source_index + 1]
+        old_source_keys = source_keys[: source_index + 1]
 
-        if len(old_source) <= len(target):
-            if target[-len(old_source) :] != old_source:
-                raise ValueError(
+        if len(old_source_keys) <= len(target_keys):
+            if target_keys[-len(old_source_keys) :] != old_source_keys:
+                raise ConflictError(
                     "no clean match between end of target and beginning of source"
                 )
         else:
-            if target != source[source_index + 1 - len(target) : source_index + 1]:
-                raise ValueError(
+            if (
+                target_keys
+                != source_keys[source_index + 1 - len(target_keys) : source_index + 1]
+            ):
+                raise ConflictError(
                     "no clean match between entire target and beginning of source"
                 )
 
@@ -180,7 +217,8 @@ class Comparison(ComparisonABC):
         target: typing.List[ComparisonItemType],
     ) -> typing.List[ComparisonItemType]:
         """
-        Overlap must include first element of source.
+        Overlap must include first element of source. Raises `ConflictError` if
+        the overlap differs between source and target.
         """
 
         source, target = cls._strip_none(source), cls._strip_none(target)
@@ -193,29 +231,61 @@ class Comparison(ComparisonABC):
         if any((element is None for element in target)):
             raise ValueError("target is not consecutive")
 
-        source_names = {item.name for item in source}
-        target_names = {item.name for item in target}
+        identity = cls._identity(source + target)
+        source_keys = [identity(element) for element in source]
+        target_keys = [identity(element) for element in target]
+        target_positions = cls._positions(target_keys)
 
-        if len(source_names) != len(source):
+        if len(cls._positions(source_keys)) != len(source):
             raise ValueError("source contains doublicate entires")
-        if len(target_names) != len(target):
+        if len(target_positions) != len(target):
             raise ValueError("target contains doublicate entires")
 
         overlap_tail = []
-        for item in source:
-            if item.name not in target_names:
+        for item, key in zip(source, source_keys):
+            if key not in target_positions.keys():
                 break
             overlap_tail.append(item)
 
         if len(overlap_tail) == 0:
             return overlap_tail
 
-        target_index = target.index(overlap_tail[0])
-        if overlap_tail != target[target_index : target_index + len(overlap_tail)]:
-            raise ValueError("no clean match in overlap area")
+        target_index = target_positions[source_keys[0]]
+        if (
+            source_keys[: len(overlap_tail)]
+            != target_keys[target_index : target_index + len(overlap_tail)]
+        ):
+            raise ConflictError("no clean match in overlap area")
 
         return overlap_tail
 
+    @staticmethod
+    def _identity(
+        elements: typing.List[ComparisonItemType],
+    ) -> typing.Callable[[ComparisonStrictItemType], ComparisonKeyTypes]:
+        """
+        Snapshots are identified by their GUIDs if they are known for all of them,
+        so renamed snapshots still match. Otherwise, e.g. for datasets, elements
+        are identified by name.
+        """
+
+        if len(elements) > 0 and all(
+            (getattr(element, "guid", None) is not None for element in elements)
+        ):
+            return lambda element: element.guid
+        return lambda element: element.name
+
+    @staticmethod
+    def _positions(
+        keys: typing.List[ComparisonKeyTypes],
+    ) -> typing.Dict[ComparisonKeyTypes, int]:
+        """
+        Maps keys to positions, replacing repeated lookups through `list.index`.
+        Duplicate keys result in fewer entries than keys.
+        """
+
+        return {key: index for index, key in enumerate(keys)}
+
     @classmethod
     def _strip_none(
         cls, elements: typing.List[ComparisonItemType]
@@ -239,18 +309,20 @@ class Comparison(ComparisonABC):
     def _single_items(
         items_a: typing.Union[ComparisonMergeTypes, None],
         items_b: typing.Union[ComparisonMergeTypes, None],
+        backend: typing.Union[None, typing.Type[ComparisonABC]] = None,
     ) -> typing.List[ComparisonItemABC]:
 
         assert items_a is not None or items_b is not None
 
         if items_a is None:
-            return [ComparisonItem(None, item) for item in items_b]
-        return [ComparisonItem(item, None) for item in items_a]
+            return [ComparisonItem(None, item, backend) for item in items_b]
+        return [ComparisonItem(item, None, backend) for item in items_a]
 
     @staticmethod
     def _merge_datasets(
         items_a: typing.Generator[DatasetABC, None, None],
         items_b: typing.Generator[DatasetABC, None, None],
+        backend: typing.Union[None, typing.Type[ComparisonABC]] = None,
     ) -> typing.List[ComparisonItemABC]:
 
         items_a = {item.subname: item for item in items_a}
@@ -258,7 +330,7 @@ class Comparison(ComparisonABC):
 
         names = list(items_a.keys() | items_b.keys())
         merged = [
-            ComparisonItem(items_a.get(name, None), items_b.get(name, None))
+            ComparisonItem(items_a.get(name, None), items_b.get(name, None), backend)
             for name in names
         ]
         merged.sort(key=lambda item: item.get_item().name)
@@ -270,7 +342,12 @@ class Comparison(ComparisonABC):
         cls,
         zpool_a: typing.Union[ZpoolABC, None],
         zpool_b: typing.Union[ZpoolABC, None],
+        backend: typing.Union[None, typing.Type[ComparisonABC]] = None,
     ) -> ComparisonABC:
+        """
+        Compares the datasets of two zpools. The snapshots of each pair of datasets
+        are compared by `backend`, by default `Comparison.from_datasets`.
+        """
 
         assert zpool_a is not None or zpool_b is not None
 
@@ -281,6 +358,7 @@ class Comparison(ComparisonABC):
                 merged=cls._single_items(
                     getattr(zpool_a, "datasets", None),
                     getattr(zpool_b, "datasets", None),
+                    backend,
                 ),
             )
 
@@ -290,22 +368,30 @@ class Comparison(ComparisonABC):
         return cls(
             a=zpool_a,
             b=zpool_b,
-            merged=cls._merge_datasets(zpool_a.datasets, zpool_b.datasets),
+            merged=cls._merge_datasets(zpool_a.datasets, zpool_b.datasets, backend),
         )
 
-    @staticmethod
+    @classmethod
     def _merge_snapshots(
+        cls,
         items_a: typing.Generator[SnapshotABC, None, None],
         items_b: typing.Generator[SnapshotABC, None, None],
     ) -> typing.List[ComparisonItemABC]:
 
         items_a = list(items_a)
         items_b = list(items_b)
-        names_a = [item.name for item in items_a]
-        names_b = [item.name for item in items_b]
 
-        assert len(set(names_a)) == len(items_a)  # unique names
-        assert len(set(names_b)) == len(items_b)  # unique names
+        assert len({item.name for item in items_a}) == len(items_a)  # unique names
+        assert len({item.name for item in items_b}) == len(items_b)  # unique names
+
+        cls._check_conflicts(items_a, items_b)
+
+        identity = cls._identity(items_a + items_b)
+        positions_a = cls._positions([identity(item) for item in items_a])
+        positions_b = cls._positions([identity(item) for item in items_b])
+
+        assert len(positions_a) == len(items_a)  # unique identities
+        assert len(positions_b) == len(items_b)  # unique identities
 
         if len(items_a) == 0 and len(items_b) == 0:
             return []
@@ -314,16 +400,13 @@ class Comparison(ComparisonABC):
         if len(items_b) == 0:
             return [ComparisonItem(item, None) for item in items_a]
 
-        try:
-            start_b = names_a.index(names_b[0])
-        except ValueError:
-            start_b = None
-        try:
-            start_a = names_b.index(names_a[0])
-        except ValueError:
-            start_a = None
+        start_b = positions_a.get(identity(items_b[0]))
+        start_a = positions_b.get(identity(items_a[0]))
 
-        assert start_a is not None or start_b is not None  # overlap
+        if start_a is None and start_b is None:
+            raise ConflictError("no common snapshot")
+        if start_a is not None and start_b is not None and min(start_a, start_b) > 0:
+            raise ConflictError("inconsistent snapshot names")
 
         prefix_a = [] if start_a is None else [None for _ in range(start_a)]
         prefix_b = [] if start_b is None else [None for _ in range(start_b)]
@@ -351,18 +434,38 @@ class Comparison(ComparisonABC):
             if new_state_a != state_a:
                 alt_a, state_a = alt_a + 1, new_state_a
                 if alt_a > 2:
-                    raise ValueError("gap in snapshot series")
+                    raise ConflictError("gap in snapshot series")
             if new_state_b != state_b:
                 alt_b, state_b = alt_b + 1, new_state_b
                 if alt_b > 2:
-                    raise ValueError("gap in snapshot series")
+                    raise ConflictError("gap in snapshot series")
             if state_a and state_b:
-                if item_a.name != item_b.name:
-                    raise ValueError("inconsistent snapshot names")
+                if identity(item_a) != identity(item_b):
+                    raise ConflictError("inconsistent snapshot names")
             merged.append(ComparisonItem(item_a, item_b))
 
         return merged
 
+    @staticmethod
+    def _check_conflicts(
+        items_a: typing.List[SnapshotABC], items_b: typing.List[SnapshotABC]
+    ):
+        """
+        Raises `ConflictError` if snapshots of the same name have different GUIDs,
+        i.e. different contents, on both sides.
+        """
+
+        guids_b = {item.name: item.guid for item in items_b}
+
+        for item_a in items_a:
+            guid_b = guids_b.get(item_a.name, None)
+            if guid_b is None or item_a.guid is None:
+                continue
+            if guid_b != item_a.guid:
+                raise ConflictError(
+                    f'snapshot "{item_a.name:s}" differs between both sides (guid)'
+                )
+
     @classmethod
     def from_datasets(
         cls,
@@ -394,13 +497,20 @@ class Comparison(ComparisonABC):
 
 @typeguard.typechecked
 class ComparisonItem(ComparisonItemABC):
-    def __init__(self, a: ComparisonItemType, b: ComparisonItemType):
+    def __init__(
+        self,
+        a: ComparisonItemType,
+        b: ComparisonItemType,
+        backend: typing.Union[None, typing.Type[ComparisonABC]] = None,
+    ):
 
         assert a is not None or b is not None
         if a is not None and b is not None:
             assert type(a) == type(b)
 
         self._a, self._b = a, b
+        self._comparison = None
+        self._backend = Comparison if backend is None else backend
 
     def get_item(self) -> ComparisonStrictItemType:
 
@@ -408,6 +518,20 @@ class ComparisonItem(ComparisonItemABC):
             return self._a
         return self._b
 
+    @property
+    def comparison(self) -> ComparisonABC:
+        """
+        Comparison of the snapshots of a pair of datasets. It is computed on first
+        access and shared by all subsequent users of this item.
+        """
+
+        assert isinstance(self.get_item(), DatasetABC)
+
+        if self._comparison is None:
+            self._comparison = self._backend.from_datasets(self._a, self._b)
+
+        return self._comparison
+
     @property
     def complete(self) -> bool:
 
@@ -41,6 +41,9 @@ except ImportError:
 
 from .abc import ConfigABC
 from .lib import valid_name
+from .profile import SEND_FLAGS
+from .transport import COMPRESSIONS, TOPOLOGIES, TRANSPORTS
+from .zpool import COMPARISON_BACKENDS
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS
@@ -56,6 +59,35 @@ class Config(ConfigABC, dict):
             "compression": lambda v: isinstance(v, bool),
             "cipher": lambda v: isinstance(v, str) or v is None,
         }
+        ssh_optional = {
+            "multiplex": lambda v: isinstance(v, bool),
+        }
+
+        transfer_optional = {
+            "transport": lambda v: v in TRANSPORTS,
+            "topology": lambda v: v in TOPOLOGIES,
+            "buffer": lambda v: isinstance(v, str) and len(v) > 0,
+            "address": lambda v: v is None or (isinstance(v, str) and len(v) > 0),
+            "port": lambda v: isinstance(v, int)
+            and not isinstance(v, bool)
+            and 1 <= v <= 65535,
+            "compression": lambda v: v in (None, False, "none", *COMPRESSIONS),
+            "compression_level": lambda v: v is None
+            or (isinstance(v, int) and not isinstance(v, bool)),
+            "compression_threads": lambda v: isinstance(v, int)
+            and not isinstance(v, bool)
+            and v >= 0,
+            "compression_skip_ratio": lambda v: isinstance(v, (int, float))
+            and not isinstance(v, bool)
+            and v > 0,
+        }
+
+        profile_optional = {
+            "datasets": lambda v: isinstance(v, list)
+            and all((isinstance(item, str) and len(item) > 0 for item in v)),
+            "flags": lambda v: isinstance(v, list)
+            and all((item in SEND_FLAGS.keys() for item in v)),
+        }
 
         side_schema = {
             "zpool": lambda v: isinstance(v, str) and len(v) > 0,
@@ -63,24 +95,65 @@ class Config(ConfigABC, dict):
             "host": lambda v: isinstance(v, str) and len(v) > 0,
             "user": lambda v: isinstance(v, str) or v is None,
         }
+        side_optional = {
+            "jobs": lambda v: isinstance(v, int) and not isinstance(v, bool) and v >= 1,
+        }
 
         root_schema = {
-            "source": lambda v: cls._validate(data=v, schema=side_schema),
-            "target": lambda v: cls._validate(data=v, schema=side_schema),
+            "source": lambda v: cls._validate(
+                data=v, schema=side_schema, optional=side_optional
+            ),
+            "target": lambda v: cls._validate(
+                data=v, schema=side_schema, optional=side_optional
+            ),
             "keep_snapshots": lambda v: isinstance(v, int) and v >= 1,
             "suffix": lambda v: v is None or (isinstance(v, str) and valid_name(v)),
             "digits": lambda v: isinstance(v, int) and v >= 1,
             "ignore": lambda v: isinstance(v, list)
             and all((isinstance(item, str) and len(item) > 0 for item in v)),
-            "ssh": lambda v: cls._validate(data=v, schema=ssh_schema),
+            "ssh": lambda v: cls._validate(
+                data=v, schema=ssh_schema, optional=ssh_optional
+            ),
+        }
+        root_optional = {
+            "defer_destroy": lambda v: isinstance(v, bool),
+            "send_intermediary": lambda v: isinstance(v, bool),
+            "probe_size": lambda v: isinstance(v, int)
+            and not isinstance(v, bool)
+            and v >= 0,
+            "jobs": lambda v: isinstance(v, int) and not isinstance(v, bool) and v >= 1,
+            "comparison_backend": lambda v: isinstance(v, str)
+            and v in COMPARISON_BACKENDS.keys(),
+            "send_profiles": lambda v: isinstance(v, dict)
+            and all(
+                (
+                    isinstance(name, str)
+                    and isinstance(profile, dict)
+                    and cls._validate(
+                        data=profile, schema={}, optional=profile_optional
+                    )
+                    for name, profile in v.items()
+                )
+            ),
+            "transfer": lambda v: isinstance(v, dict)
+            and cls._validate(data=v, schema={}, optional=transfer_optional),
         }
 
         config = yaml.load(fd.read(), Loader=Loader)
-        cls._validate(data=config, schema=root_schema)
+        cls._validate(data=config, schema=root_schema, optional=root_optional)
         return cls(config)
 
     @classmethod
-    def _validate(cls, data: typing.Dict, schema: typing.Dict):
+    def _validate(
+        cls,
+        data: typing.Dict,
+        schema: typing.Dict,
+        optional: typing.Union[None, typing.Dict] = None,
+    ):
+        """
+        Checks `data` against validators of required (`schema`) and optional
+        (`optional`) fields.
+        """
 
         for field, validator in schema.items():
             if field not in data.keys():
@@ -88,4 +161,8 @@ class Config(ConfigABC, dict):
             if not validator(data[field]):
                 raise ValueError(f'invalid value in field "{field:s}"')
 
+        for field, validator in ({} if optional is None else optional).items():
+            if field in data.keys() and not validator(data[field]):
+                raise ValueError(f'invalid value in field "{field:s}"')
+
         return True
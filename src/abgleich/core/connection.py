@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    src/abgleich/core/connection.py: Persistent connections to hosts
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import atexit
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import typing
+
+import typeguard
+
+from .abc import ConnectionABC
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@typeguard.typechecked
+class LocalConnection(ConnectionABC):
+    """
+    Stand-in for hosts which are not contacted via ssh (localhost).
+    Commands are run unchanged on the controlling machine.
+    """
+
+    def __init__(self, side: str):
+
+        self._side = side
+        self._open = False
+
+    def __str__(self) -> str:
+
+        return "localhost"
+
+    @property
+    def host(self) -> str:
+
+        return "localhost"
+
+    @property
+    def connected(self) -> bool:
+
+        return self._open
+
+    @property
+    def side(self) -> str:
+
+        return self._side
+
+    def connect(self):
+
+        self._open = True
+
+    def disconnect(self):
+
+        self._open = False
+
+    def wrap(self, cmd: typing.List[str], shared: bool = True) -> typing.List[str]:
+
+        return cmd.copy()
+
+
+@typeguard.typechecked
+class SSHConnection(ConnectionABC):
+    """
+    ssh connection to a remote host. If `multiplex` is set, a master connection
+    is opened on first use and shared by all subsequent commands through a
+    control socket (ControlMaster/ControlPath) until it is disconnected.
+    """
+
+    def __init__(
+        self,
+        side: str,
+        side_config: typing.Dict,
+        ssh_config: typing.Dict,
+        multiplex: bool = False,
+    ):
+
+        self._side = side
+        self._user = side_config["user"]
+        self._host = side_config["host"]
+        self._compression = ssh_config["compression"]
+        self._cipher = ssh_config["cipher"]
+        self._multiplex = multiplex
+
+        self._lock = threading.Lock()
+        self._path = None  # temporary directory for control socket
+        self._open = False
+        self._failed = False
+
+    def __str__(self) -> str:
+
+        return f"{self._user:s}@{self._host:s}"
+
+    @property
+    def host(self) -> str:
+
+        return self._host
+
+    @property
+    def connected(self) -> bool:
+
+        return self._open
+
+    @property
+    def side(self) -> str:
+
+        return self._side
+
+    @property
+    def _socket(self) -> str:
+
+        return os.path.join(self._path, self._side)
+
+    def _options(self) -> typing.List[str]:
+
+        options = [
+            "-T",  # Disable pseudo-terminal allocation
+            "-o",
+            "Compression=yes" if self._compression else "Compression=no",
+        ]
+        if self._cipher is not None:
+            options.extend(("-c", self._cipher))
+
+        return options
+
+    def connect(self):
+
+        if not self._multiplex:
+            return
+
+        with self._lock:
+
+            if self._open or self._failed:
+                return
+
+            self._path = tempfile.mkdtemp(prefix="abgleich-")
+            proc = subprocess.run(
+                [
+                    "ssh",
+                    *self._options(),
+                    "-o",
+                    "ControlMaster=yes",
+                    "-o",
+                    f"ControlPath={self._socket:s}",
+                    "-o",
+                    "ControlPersist=60",  # fallback if never disconnected
+                    "-N",  # no remote command
+                    "-f",  # go to background after authentication
+                    str(self),
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+            if proc.returncode != 0:  # e.g. host is down, use plain connections
+                self._failed = True
+                shutil.rmtree(self._path, ignore_errors=True)
+                self._path = None
+                return
+
+            self._open = True
+
+    def disconnect(self):
+
+        with self._lock:
+
+            if not self._open:
+                return
+
+            subprocess.run(
+                [
+                    "ssh",
+                    "-o",
+                    f"ControlPath={self._socket:s}",
+                    "-O",
+                    "exit",
+                    str(self),
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            shutil.rmtree(self._path, ignore_errors=True)
+            self._path = None
+            self._open = False
+
+    def wrap(self, cmd: typing.List[str], shared: bool = True) -> typing.List[str]:
+        """
+        Wraps a command for being run on the remote host. The shared connection
+        is used if it has been opened by `connect` before. If `shared` is not set,
+        it is not used, e.g. if the wrapped command is meant to be run on another
+        host. Wrapping never opens connections.
+        """
+
+        wrapped = ["ssh", *self._options()]
+        if shared and self._open:
+            wrapped.extend(
+                ("-o", "ControlMaster=no", "-o", f"ControlPath={self._socket:s}")
+            )
+        wrapped.extend([str(self), " ".join([shlex.quote(item) for item in cmd])])
+
+        return wrapped
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+@typeguard.typechecked
+def get_connection(side: str, config: typing.Dict) -> ConnectionABC:
+    """
+    Returns the connection owned by a side, creating it on first use.
+    Connections live until `close_connections` is called (at exit at the latest).
+    """
+
+    key = (side, config[side]["host"], config[side]["user"])
+
+    with _connections_lock:
+
+        if key not in _connections.keys():
+            if config[side]["host"] == "localhost":
+                _connections[key] = LocalConnection(side)
+            else:
+                _connections[key] = SSHConnection(
+                    side,
+                    side_config=config[side],
+                    ssh_config=config["ssh"],
+                    multiplex=config["ssh"].get("multiplex", True),
+                )
+
+        return _connections[key]
+
+
+def close_connections():
+
+    with _connections_lock:
+
+        for connection in _connections.values():
+            connection.disconnect()
+        _connections.clear()
+
+
+atexit.register(close_connections)
@@ -29,6 +29,7 @@ specific language governing rights and limitations under the License.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 import datetime
+import hashlib
 import typing
 
 # Python <= 3.7.1 "fix"
@@ -42,9 +43,9 @@ import typeguard
 from .abc import ConfigABC, DatasetABC, PropertyABC, TransactionABC, SnapshotABC
 from .command import Command
 from .i18n import t
-from .lib import root
+from .lib import get_property, root
 from .property import Property
-from .transaction import Transaction, TransactionMeta
+from .transaction import BATCH_MAX_LENGTH, Transaction, TransactionMeta
 from .snapshot import Snapshot
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -61,6 +62,8 @@ class Dataset(DatasetABC):
         snapshots: typing.List[SnapshotABC],
         side: str,
         config: ConfigABC,
+        lazy: bool = False,
+        fingerprint: typing.Union[None, str] = None,
     ):
 
         self._name = name
@@ -68,16 +71,23 @@ class Dataset(DatasetABC):
         self._snapshots = snapshots
         self._side = side
         self._config = config
+        self._lazy = lazy  # properties are incomplete, fetch missing ones on demand
 
         self._root = root(config[side]["zpool"], config[side]["prefix"])
 
         assert self._name.startswith(self._root)
         self._subname = self._name[len(self._root) :].strip("/")
 
+        self._fingerprint = fingerprint
+
     def __eq__(self, other: DatasetABC) -> bool:
 
         return self.subname == other.subname
 
+    def __hash__(self) -> int:
+
+        return hash(self._subname)
+
     def __len__(self) -> int:
 
         return len(self._snapshots)
@@ -85,7 +95,7 @@ class Dataset(DatasetABC):
     def __getitem__(self, key: typing.Union[str, int, slice]) -> PropertyABC:
 
         if isinstance(key, str):
-            return self._properties[key]
+            return self._get_property(key)
         return self._snapshots[key]
 
     def get(
@@ -95,6 +105,8 @@ class Dataset(DatasetABC):
     ) -> typing.Union[None, PropertyABC]:
 
         if isinstance(key, str):
+            if key not in self._properties.keys() and self._lazy:
+                return self._get_property(key)
             return self._properties.get(
                 key, Property(key, None, None) if default is None else default,
             )
@@ -106,6 +118,15 @@ class Dataset(DatasetABC):
         except IndexError:
             return default
 
+    def _get_property(self, key: str) -> PropertyABC:
+
+        if key not in self._properties.keys() and self._lazy:
+            self._properties[key] = get_property(
+                self._name, key, self._side, self._config
+            )
+
+        return self._properties[key]
+
     @property
     def changed(self) -> bool:
 
@@ -113,24 +134,39 @@ class Dataset(DatasetABC):
             return True
         if self._config["always_changed"]:
             return True
-        if self._properties["written"].value == 0:
+        if self["written"].value == 0:
             return False
-        if self._properties["type"].value == "volume":
+        if self["type"].value == "volume":
             return True
 
         if self._config["written_threshold"] is not None:
-            if self._properties["written"].value > self._config["written_threshold"]:
+            if self["written"].value > self._config["written_threshold"]:
                 return True
 
         if not self._config["check_diff"]:
             return True
 
-        output, _ = Command.on_side(
+        lines = Command.on_side(
             ["zfs", "diff", f"{self._name:s}@{self._snapshots[-1].name:s}"],
             self._side,
             self._config,
-        ).run()
-        return len(output.strip(" \t\n")) > 0
+        ).run_stream()
+        for line in lines:
+            if len(line.strip(b" \t")) > 0:
+                lines.close()  # first change is enough, stop diff
+                return True
+        return False
+
+    @property
+    def fingerprint(self) -> typing.Union[None, str]:
+        """
+        Hash of the GUID of the newest snapshot and of a pending resume token, see
+        `Dataset.from_entities`. Datasets with equal fingerprints on source and
+        target are in sync for backups, even if older snapshots were cleaned up on
+        either side. `None` if the GUID of the newest snapshot is unknown.
+        """
+
+        return self._fingerprint
 
     @property
     def name(self) -> str:
@@ -152,6 +188,52 @@ class Dataset(DatasetABC):
 
         return self._root
 
+    def get_cleanup_transactions(
+        self, snapshots: typing.List[SnapshotABC]
+    ) -> typing.Generator[TransactionABC, None, None]:
+        """
+        Destroys snapshots of this dataset with as few `zfs destroy` commands as
+        possible, using comma-separated lists of snapshot names. Lists are
+        bounded by `BATCH_MAX_LENGTH`.
+        """
+
+        assert self._side == "source"
+
+        chunk, length = [], 0
+        for snapshot in snapshots:
+            assert snapshot.parent == self._name
+            if len(chunk) > 0 and length + len(snapshot.name) + 1 > BATCH_MAX_LENGTH:
+                yield self._get_cleanup_transaction(chunk)
+                chunk, length = [], 0
+            chunk.append(snapshot)
+            length += len(snapshot.name) + 1
+        if len(chunk) > 0:
+            yield self._get_cleanup_transaction(chunk)
+
+    def _get_cleanup_transaction(
+        self, snapshots: typing.List[SnapshotABC]
+    ) -> TransactionABC:
+
+        cmd = ["zfs", "destroy"]
+        if self._config.get("defer_destroy", False):
+            cmd.append("-d")
+        cmd.append(
+            f'{self._name:s}@{",".join([snapshot.name for snapshot in snapshots]):s}'
+        )
+
+        return Transaction(
+            meta=TransactionMeta(
+                **{
+                    t("type"): t("cleanup_snapshot"),
+                    t("snapshot_subparent"): self._subname,
+                    t("snapshot_name"): snapshots[0].name,
+                    t("last_snapshot_name"): snapshots[-1].name,
+                    t("snapshot_count"): len(snapshots),
+                }
+            ),
+            commands=[Command.on_side(cmd, self._side, self._config)],
+        )
+
     def get_snapshot_transaction(self) -> TransactionABC:
 
         snapshot_name = self._new_snapshot_name()
@@ -162,7 +244,7 @@ class Dataset(DatasetABC):
                     t("type"): t("snapshot"),
                     t("dataset_subname"): self._subname,
                     t("snapshot_name"): snapshot_name,
-                    t("written"): self._properties["written"].value,
+                    t("written"): self["written"].value,
                 }
             ),
             [
@@ -172,6 +254,7 @@ class Dataset(DatasetABC):
                     self._config,
                 )
             ],
+            batchable=True,
         )
 
     def _new_snapshot_name(self) -> str:
@@ -207,6 +290,33 @@ class Dataset(DatasetABC):
 
         return f"{today:s}{new_number:02d}{suffix}"
 
+    @staticmethod
+    def _get_param(
+        entity: typing.List[typing.List[str]], key: str
+    ) -> typing.Union[None, str]:
+        """
+        Raw value of a property of an entity if it is loaded and set.
+        """
+
+        for name, value, _ in entity:
+            if name == key and value not in ("", "-"):
+                return value
+        return None
+
+    @staticmethod
+    def _get_fingerprint(
+        guid: typing.Union[None, str], token: typing.Union[None, str]
+    ) -> typing.Union[None, str]:
+
+        if guid is None:
+            return None
+
+        fingerprint = hashlib.sha256(f"{guid:s}\n".encode("utf-8"))
+        if token is not None:
+            fingerprint.update(f"token {token:s}\n".encode("utf-8"))
+
+        return fingerprint.hexdigest()
+
     @classmethod
     def from_entities(
         cls,
@@ -214,23 +324,49 @@ class Dataset(DatasetABC):
         entities: DictType[str, typing.List[typing.List[str]]],
         side: str,
         config: ConfigABC,
+        lazy: bool = False,
     ) -> DatasetABC:
 
         properties = {
             property.name: property
             for property in (Property.from_params(*params) for params in entities[name])
         }
-        entities.pop(name)
+        token = cls._get_param(entities.pop(name), "receive_resume_token")
 
-        snapshots = []
-        snapshots.extend(
+        snapshot_names = list(entities.keys())
+        createtxgs = {
+            snapshot_name: cls._get_param(entities[snapshot_name], "createtxg")
+            for snapshot_name in snapshot_names
+        }
+        if all(
             (
+                createtxg is not None and createtxg.isnumeric()
+                for createtxg in createtxgs.values()
+            )
+        ):
+            snapshot_names.sort(
+                key=lambda snapshot_name: int(createtxgs[snapshot_name])
+            )
+
+        fingerprint = cls._get_fingerprint(
+            cls._get_param(entities[snapshot_names[-1]], "guid")
+            if len(snapshot_names) > 0
+            else "",  # no snapshots
+            token,
+        )
+
+        snapshots = []  # in order of creation, if createtxg is known
+        for snapshot_name in snapshot_names:
+            snapshots.append(
                 Snapshot.from_entity(
-                    snapshot_name, entities[snapshot_name], snapshots, side, config,
+                    snapshot_name,
+                    entities[snapshot_name],
+                    snapshots[-1] if len(snapshots) > 0 else None,
+                    side,
+                    config,
+                    lazy=lazy,
                 )
-                for snapshot_name in entities.keys()
             )
-        )
 
         return cls(
             name=name,
@@ -238,4 +374,6 @@ class Dataset(DatasetABC):
             snapshots=snapshots,
             side=side,
             config=config,
+            lazy=lazy,
+            fingerprint=fingerprint,
         )
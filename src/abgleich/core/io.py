@@ -62,6 +62,14 @@ def colorize(text: str, col: str) -> str:
     return c.get(col.upper(), c["GREY"]) + text + c["RESET"]
 
 
+@typeguard.typechecked
+def humanize_time(seconds: typing.Union[float, int]) -> str:
+
+    seconds = int(round(seconds))
+
+    return f"{seconds // 3600:d}:{(seconds // 60) % 60:02d}:{seconds % 60:02d}"
+
+
 @typeguard.typechecked
 def humanize_size(
     size: typing.Union[float, int], add_color: bool = False, get_rgb: bool = False
@@ -29,18 +29,64 @@ specific language governing rights and limitations under the License.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 import re
+import time
 import typing
 
 import typeguard
 
-from .abc import ConfigABC
+from .abc import CommandABC, ConfigABC, PropertyABC
 from .command import Command
+from .property import Property
+from .transport import Transport
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # ROUTINES
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 
+@typeguard.typechecked
+def get_features(side: str, config: ConfigABC) -> typing.Set[str]:
+    """
+    Features of the zpool of a side which are enabled or active.
+    """
+
+    output, _ = Command.on_side(
+        [
+            "zpool",
+            "get",
+            "-H",
+            "-p",
+            "-o",
+            "property,value",
+            "all",
+            config[side]["zpool"],
+        ],
+        side,
+        config,
+    ).run()
+
+    features = set()
+    for line in output.split("\n"):
+        if not line.startswith("feature@"):
+            continue
+        name, value = line.split("\t")[:2]
+        if value in ("enabled", "active"):
+            features.add(name[len("feature@") :])
+
+    return features
+
+
+@typeguard.typechecked
+def get_property(name: str, key: str, side: str, config: ConfigABC) -> PropertyABC:
+
+    output, _ = Command.on_side(
+        ["zfs", "get", "-H", "-p", key, name], side, config
+    ).run()
+
+    _, *params = output.strip("\n").split("\t")
+    return Property.from_params(*params)
+
+
 @typeguard.typechecked
 def is_host_up(side: str, config: ConfigABC) -> bool:
 
@@ -53,6 +99,86 @@ def is_host_up(side: str, config: ConfigABC) -> bool:
     return returncode == 0
 
 
+@typeguard.typechecked
+def measure_throughput(config: ConfigABC, size: int) -> float:
+    """
+    Measures the throughput between source and target in bytes per second
+    by transferring `size` bytes of random (incompressible) data through
+    the same channel as backups, see `Transport.from_config`. The duration of
+    an empty transfer, i.e. the startup of ssh and all processes involved,
+    is subtracted.
+    """
+
+    assert size > 0
+
+    transport = Transport.from_config(config)
+
+    def transfer(length: int) -> float:
+        start = time.monotonic()
+        transport.probe(
+            Command.on_side(
+                ["head", "-c", str(length), "/dev/urandom"], "source", config
+            ),
+            Command.on_side(["sh", "-c", "cat > /dev/null"], "target", config),
+        )
+        return time.monotonic() - start
+
+    baseline = transfer(0)
+    duration = transfer(size)
+
+    return size / max(duration - baseline, 1e-3)
+
+
+@typeguard.typechecked
+def resume_token_snapshot(
+    token: str, side: str, config: ConfigABC
+) -> typing.Union[None, str]:
+    """
+    Returns the name of the snapshot an interrupted transfer was sending,
+    decoded from its `receive_resume_token` through a dry run (`zfs send -nvP -t`)
+    on `side`. Returns `None` if the transfer can not be resumed.
+    """
+
+    output, errors, returncode, _ = Command.on_side(
+        ["zfs", "send", "-n", "-v", "-P", "-t", token], side, config
+    ).run(returncode=True)
+
+    if returncode != 0:
+        return None
+
+    for line in (output + "\n" + errors).split("\n"):
+        key, _, value = line.strip().partition(" = ")
+        if key == "toname" and "@" in value:
+            return value.split("@")[-1]
+
+    return None
+
+
+@typeguard.typechecked
+def send_size(command: CommandABC) -> typing.Union[None, int]:
+    """
+    Estimates the size of the stream of a `zfs send` command in bytes
+    through a dry run (`zfs send -nvP`). Returns `None` if there is no estimate.
+    """
+
+    args = command.args
+    assert args[:2] == ["zfs", "send"]
+
+    output, errors, returncode, _ = Command(
+        args[:2] + ["-n", "-v", "-P"] + args[2:], connection=command.connection
+    ).run(returncode=True)
+
+    if returncode != 0:
+        return None
+
+    for line in (output + "\n" + errors).split("\n"):  # location depends on zfs version
+        fields = line.strip().split("\t")
+        if len(fields) == 2 and fields[0] == "size" and fields[1].isnumeric():
+            return int(fields[1])
+
+    return None
+
+
 @typeguard.typechecked
 def join(*args: str) -> str:
 
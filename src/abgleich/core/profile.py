@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    src/abgleich/core/profile.py: Flags of zfs send per dataset
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import fnmatch
+import typing
+
+import typeguard
+
+from .abc import ConfigABC, SendProfileABC
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# Flags of zfs send and the zpool features they require on both sides
+SEND_FLAGS = {
+    "compressed": ("-c", None),
+    "embed": ("-e", "embedded_data"),
+    "large-block": ("-L", "large_blocks"),
+    "raw": ("-w", "encryption"),
+}
+DEFAULT_PROFILE = "default"
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@typeguard.typechecked
+class SendProfile(SendProfileABC):
+    """
+    A named set of `zfs send` flags, applied to datasets whose names (relative
+    to the prefix) match one of `datasets` (shell-style patterns).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flags: typing.List[str],
+        datasets: typing.Union[None, typing.List[str]] = None,
+    ):
+
+        for flag in flags:
+            if flag not in SEND_FLAGS.keys():
+                raise ValueError(
+                    f'unknown send flag "{flag:s}" in send profile "{name:s}"'
+                )
+
+        self._name = name
+        self._flags = flags
+        self._datasets = [] if datasets is None else datasets
+
+    def __str__(self) -> str:
+
+        return self._name
+
+    @property
+    def args(self) -> typing.List[str]:
+
+        return [SEND_FLAGS[flag][0] for flag in self._flags]
+
+    @property
+    def features(self) -> typing.Set[str]:
+
+        return {
+            SEND_FLAGS[flag][1]
+            for flag in self._flags
+            if SEND_FLAGS[flag][1] is not None
+        }
+
+    @property
+    def flags(self) -> typing.List[str]:
+
+        return self._flags.copy()
+
+    @property
+    def name(self) -> str:
+
+        return self._name
+
+    def matches(self, subname: str) -> bool:
+
+        return any(
+            (fnmatch.fnmatchcase(subname, pattern) for pattern in self._datasets)
+        )
+
+    def validate(self, features: typing.Dict[str, typing.Set[str]]):
+        """
+        Raises `ValueError` if a required zpool feature is not enabled on a side.
+        `features` maps sides to their enabled features, see `get_features`.
+        """
+
+        for side, enabled in features.items():
+            missing = sorted(self.features - enabled)
+            if len(missing) > 0:
+                raise ValueError(
+                    f'send profile "{self._name:s}" requires zpool features '
+                    f'{", ".join(missing):s} on {side:s}'
+                )
+
+    @classmethod
+    def from_config(cls, config: ConfigABC) -> typing.List[SendProfileABC]:
+        """
+        Profiles in the order of configuration, followed by the default profile,
+        which matches all datasets. Unless configured otherwise, the default
+        profile sends compressed streams.
+        """
+
+        profiles = {
+            name: cls(
+                name=name,
+                flags=profile.get("flags", []),
+                datasets=profile.get("datasets", []),
+            )
+            for name, profile in config.get("send_profiles", {}).items()
+        }
+
+        default = profiles.pop(DEFAULT_PROFILE, None)
+        return [
+            *profiles.values(),
+            cls(
+                name=DEFAULT_PROFILE,
+                flags=["compressed"] if default is None else default.flags,
+                datasets=["*"],
+            ),
+        ]
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    src/abgleich/core/scheduler.py: Concurrent execution of transactions
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+import heapq
+import shutil
+import sys
+import threading
+import typing
+
+import typeguard
+
+from .abc import ConfigABC, SchedulerABC, TransactionABC, TransactionListABC
+from .i18n import t
+from .io import colorize
+from .transaction import PROGRESS_INTERVAL, Transaction, TransactionList
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@typeguard.typechecked
+class Scheduler(SchedulerABC):
+    """
+    Runs batches of transactions concurrently, bounded by a global limit (`jobs`)
+    and by a limit per host (`host_jobs`). Batches of one dataset run in order.
+    The first batch of a dataset waits for the first batch of each of its parent
+    datasets, i.e. parents are created before their children. Once a batch fails,
+    no further batches are started.
+    """
+
+    def __init__(
+        self,
+        jobs: int = 1,
+        host_jobs: typing.Union[None, typing.Dict[str, int]] = None,
+    ):
+
+        assert jobs >= 1
+
+        self._jobs = jobs
+        self._host_jobs = {} if host_jobs is None else host_jobs
+
+        assert all((limit >= 1 for limit in self._host_jobs.values()))
+
+        self._condition = threading.Condition()
+        self._lines = 0
+
+    def run(self, transactions: TransactionListABC):
+
+        if self._jobs == 1:
+            transactions.run()
+            return
+
+        self.run_stream(transactions.batches)
+
+    def run_stream(self, batches: typing.Iterable[typing.List[TransactionABC]]):
+        """
+        Runs batches while they are still being produced, e.g. by a planner
+        consuming `Zpool.generate_backup_transactions`. Batches are consumed
+        by a separate thread, so transfers overlap with planning.
+        """
+
+        queued = []  # batches in order of arrival
+        dependencies = []  # indices of unfinished dependencies
+        dependents = []
+        done = set()
+        ready = []
+        running = {}
+        load = Counter()
+        errors = []
+        exhausted = threading.Event()
+
+        def feed():
+
+            try:
+                for batch, requirements in self._dependencies(batches):
+                    with self._condition:
+                        if len(errors) > 0:
+                            break
+                        index = len(queued)
+                        queued.append(batch)
+                        dependencies.append(requirements - done)
+                        dependents.append([])
+                        for requirement in dependencies[index]:
+                            dependents[requirement].append(index)
+                        if len(dependencies[index]) == 0:
+                            heapq.heappush(ready, index)
+                        self._condition.notify()
+            except Exception as error:
+                with self._condition:
+                    errors.append(error)
+            finally:
+                with self._condition:
+                    exhausted.set()
+                    self._condition.notify()
+
+        def finished(index: int, future: Future):
+
+            with self._condition:
+                load.subtract(running.pop(index))
+                done.add(index)
+                error = future.exception()
+                if error is None:
+                    error = queued[index][0].error
+                if error is not None:
+                    errors.append(error)
+                for dependent in dependents[index]:
+                    dependencies[dependent].discard(index)
+                    if len(dependencies[dependent]) == 0:
+                        heapq.heappush(ready, dependent)
+                self._report(queued[index], error)
+                self._condition.notify()
+
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            with self._condition:
+                while True:
+
+                    blocked = []
+                    while (
+                        len(errors) == 0
+                        and len(ready) > 0
+                        and len(running) < self._jobs
+                    ):
+                        index = heapq.heappop(ready)
+                        hosts = self._hosts(queued[index])
+                        if any(
+                            (
+                                load[host] >= self._host_jobs.get(host, self._jobs)
+                                for host in hosts
+                            )
+                        ):
+                            blocked.append(index)
+                            continue
+                        running[index] = hosts
+                        load.update(hosts)
+                        executor.submit(
+                            Transaction.run_batch, queued[index]
+                        ).add_done_callback(functools.partial(finished, index))
+                    for index in blocked:
+                        heapq.heappush(ready, index)
+
+                    if len(running) == 0 and (
+                        len(errors) > 0 or (exhausted.is_set() and len(ready) == 0)
+                    ):
+                        break
+
+                    self._render([queued[index] for index in sorted(running.keys())])
+                    self._condition.wait(PROGRESS_INTERVAL)
+
+                self._clear()
+
+        feeder.join()
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        if len(queued) == 0:
+            print(t("nothing to do"))
+
+    @classmethod
+    def from_config(cls, config: ConfigABC) -> SchedulerABC:
+        """
+        Limits are configured per side. If both sides are the same host, the lower
+        limit applies to both of them together.
+        """
+
+        host_jobs = {}
+        for side in ("source", "target"):
+            host = config[side]["host"]
+            limit = config[side].get("jobs", 4)
+            host_jobs[host] = min(limit, host_jobs.get(host, limit))
+
+        return cls(jobs=config.get("jobs", 1), host_jobs=host_jobs)
+
+    @staticmethod
+    def _dataset(transaction: TransactionABC) -> typing.Union[None, str]:
+
+        dataset = transaction.meta.get(t("snapshot_subparent"))
+        if dataset is None:
+            dataset = transaction.meta.get(t("dataset_subname"))
+        return dataset
+
+    @classmethod
+    def _dependencies(
+        cls, batches: typing.Iterable[typing.List[TransactionABC]]
+    ) -> typing.Generator[
+        typing.Tuple[typing.List[TransactionABC], typing.Set[int]], None, None
+    ]:
+        """
+        Yields each batch along with the indices of earlier batches it depends on.
+        Batches of unknown datasets act as barriers.
+        """
+
+        first, last = {}, {}  # dataset -> index of first and last batch
+        barrier = None
+
+        for index, batch in enumerate(batches):
+
+            datasets = {cls._dataset(transaction) for transaction in batch}
+
+            if None in datasets:
+                yield batch, set(last.values()) | (
+                    {barrier} if barrier is not None else set()
+                )
+                first, last = {}, {}
+                barrier = index
+                continue
+
+            requirements = set() if barrier is None else {barrier}
+            for dataset in datasets:
+                if dataset in last.keys():
+                    requirements.add(last[dataset])
+                    continue
+                parent = dataset
+                while len(parent) > 0:
+                    parent = parent.rpartition("/")[0]
+                    if parent in first.keys():
+                        requirements.add(first[parent])
+                first[dataset] = index
+
+            for dataset in datasets:
+                last[dataset] = index
+
+            yield batch, requirements
+
+    @staticmethod
+    def _hosts(batch: typing.List[TransactionABC]) -> typing.Tuple[str, ...]:
+
+        return tuple({command.connection.host for command in batch[0].commands})
+
+    def _clear(self):
+
+        if self._lines == 0:
+            return
+
+        print(f"\033[{self._lines:d}A\033[J", end="", flush=True)
+        self._lines = 0
+
+    def _render(self, batches: typing.List[typing.List[TransactionABC]]):
+
+        if not sys.stdout.isatty():
+            return
+
+        width = shutil.get_terminal_size().columns - 1
+
+        self._clear()
+        for batch in batches:
+            label = batch[0].commands[0].args[-1]
+            if batch[0].progress is not None:
+                label = f"{label:s}: {str(batch[0].progress):s}"
+            print(label[:width])
+        self._lines = len(batches)
+        sys.stdout.flush()
+
+    def _report(
+        self,
+        batch: typing.List[TransactionABC],
+        error: typing.Union[None, BaseException],
+    ):
+
+        self._clear()
+
+        print(
+            f'({colorize(batch[0].meta[t("type")], "white"):s}) '
+            f'{colorize(TransactionList.batch_str(batch), "yellow"):s}'
+        )
+        if batch[0].progress is not None:
+            print(str(batch[0].progress))
+        print(
+            colorize(t("FAILED"), "red")
+            if error is not None
+            else colorize(t("OK"), "green")
+        )
@@ -32,12 +32,19 @@ import typing
 
 import typeguard
 
-from .abc import ConfigABC, PropertyABC, SnapshotABC, TransactionABC
+from .abc import (
+    ConfigABC,
+    PropertyABC,
+    SendProfileABC,
+    SnapshotABC,
+    TransactionABC,
+)
 from .command import Command
 from .i18n import t
-from .lib import root
+from .lib import get_property, root
 from .property import Property
 from .transaction import Transaction, TransactionMeta
+from .transport import Transport
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS
@@ -51,17 +58,20 @@ class Snapshot(SnapshotABC):
         name: str,
         parent: str,
         properties: typing.Dict[str, PropertyABC],
-        context: typing.List[SnapshotABC],
+        ancestor: typing.Union[None, SnapshotABC],
         side: str,
         config: ConfigABC,
+        lazy: bool = False,
     ):
 
         self._name = name
         self._parent = parent
         self._properties = properties
-        self._context = context
+        self._ancestor = ancestor  # previous snapshot of the same dataset
+        self._index = 0 if ancestor is None else ancestor.index + 1
         self._side = side
         self._config = config
+        self._lazy = lazy  # properties are incomplete, fetch missing ones on demand
 
         self._root = root(config[side]["zpool"], config[side]["prefix"])
 
@@ -72,73 +82,96 @@ class Snapshot(SnapshotABC):
 
         return self.subparent == other.subparent and self.name == other.name
 
-    def __getitem__(self, name: str) -> PropertyABC:
+    def __hash__(self) -> int:
 
-        return self._properties[name]
+        return hash((self._subparent, self._name))
 
-    def get_cleanup_transaction(self) -> TransactionABC:
+    def __getitem__(self, name: str) -> PropertyABC:
 
-        assert self._side == "source"
+        if name not in self._properties.keys() and self._lazy:
+            self._properties[name] = get_property(
+                f"{self._parent:s}@{self._name:s}", name, self._side, self._config
+            )
 
-        return Transaction(
-            meta=TransactionMeta(
-                **{
-                    t("type"): t("cleanup_snapshot"),
-                    t("snapshot_subparent"): self._subparent,
-                    t("snapshot_name"): self._name,
-                }
-            ),
-            commands=[
-                Command.on_side(
-                    ["zfs", "destroy", f"{self._parent:s}@{self._name:s}"],
-                    self._side,
-                    self._config,
-                )
-            ],
-        )
+        return self._properties[name]
 
     def get_backup_transaction(
-        self, source_dataset: str, target_dataset: str,
+        self,
+        source_dataset: str,
+        target_dataset: str,
+        profile: SendProfileABC,
+        last: typing.Union[None, SnapshotABC] = None,
     ) -> TransactionABC:
+        """
+        Sends this snapshot. If `last` is a later snapshot of the same dataset,
+        this snapshot, `last` and all snapshots in between are sent as one stream
+        (`zfs send -I`). The flags of `zfs send` are taken from `profile`, which
+        must have been validated against both zpools, see `Zpool._get_send_profile`.
+        """
 
         assert self._side == "source"
 
         ancestor = self.ancestor
+        is_range = last is not None and last != self
+
+        if ancestor is None:
+            assert not is_range
+            send = ["zfs", "send", *profile.args, f"{source_dataset:s}@{self.name:s}"]
+        else:
+            send = [
+                "zfs",
+                "send",
+                *profile.args,
+                "-I" if is_range else "-i",
+                f"{source_dataset:s}@{ancestor.name:s}",
+                f"{source_dataset:s}@{last.name if is_range else self.name:s}",
+            ]
 
         commands = [
+            Command.on_side(send, "source", self._config),
             Command.on_side(
-                ["zfs", "send", "-c", f"{source_dataset:s}@{self.name:s}",]
-                if ancestor is None
-                else [
-                    "zfs",
-                    "send",
-                    "-c",
-                    "-i",
-                    f"{source_dataset:s}@{ancestor.name:s}",
-                    f"{source_dataset:s}@{self.name:s}",
-                ],
-                "source",
+                ["zfs", "receive", "-s", f"{target_dataset:s}"],
+                "target",
                 self._config,
             ),
-            Command.on_side(
-                ["zfs", "receive", f"{target_dataset:s}"], "target", self._config
-            ),
         ]
 
-        return Transaction(
-            meta=TransactionMeta(
-                **{
-                    t("type"): t("transfer_snapshot")
-                    if ancestor is None
-                    else t("transfer_snapshot_incremental"),
-                    t("snapshot_subparent"): self._subparent,
-                    t("ancestor_name"): "" if ancestor is None else ancestor.name,
-                    t("snapshot_name"): self.name,
+        meta = {
+            t("type"): t("transfer_snapshot")
+            if ancestor is None
+            else t("transfer_snapshot_incremental"),
+            t("snapshot_subparent"): self._subparent,
+            t("ancestor_name"): "" if ancestor is None else ancestor.name,
+            t("snapshot_name"): self.name,
+            t("send_profile"): profile.name,
+        }
+        if is_range:
+            assert last.subparent == self._subparent
+            meta.update(
+                {
+                    t("type"): t("transfer_snapshot_range"),
+                    t("last_snapshot_name"): last.name,
+                    t("snapshot_count"): last.index - self._index + 1,
                 }
-            ),
+            )
+
+        return Transaction(
+            meta=TransactionMeta(**meta),
             commands=commands,
+            transport=Transport.from_config(
+                self._config, compressratio=self.compressratio
+            ),
         )
 
+    @property
+    def compressratio(self) -> typing.Union[None, float]:
+
+        if "compressratio" not in self._properties.keys() and not self._lazy:
+            return None
+
+        value = self["compressratio"].value
+        return float(value) if isinstance(value, (int, float)) else None
+
     @property
     def name(self) -> str:
 
@@ -157,26 +190,55 @@ class Snapshot(SnapshotABC):
     @property
     def ancestor(self) -> typing.Union[None, SnapshotABC]:
 
-        assert self in self._context
-        self_index = self._context.index(self)
+        return self._ancestor
 
-        if self_index == 0:
-            return None
-        return self._context[self_index - 1]
+    @property
+    def createtxg(self) -> typing.Union[None, int]:
+
+        return self._get_loaded("createtxg")
+
+    @property
+    def guid(self) -> typing.Union[None, int]:
+        """
+        Identical on source and target for the same snapshot, also after renames.
+        """
+
+        return self._get_loaded("guid")
+
+    @property
+    def index(self) -> int:
+        """
+        Position among the snapshots of the dataset.
+        """
+
+        return self._index
 
     @property
     def root(self) -> str:
 
         return self._root
 
+    def _get_loaded(self, name: str) -> typing.Union[None, int]:
+        """
+        Integer property if it was loaded with the inventory. Unlike lookups through
+        `Snapshot.__getitem__`, this never triggers a call of `zfs get`.
+        """
+
+        if name not in self._properties.keys():
+            return None
+
+        value = self._properties[name].value
+        return value if isinstance(value, int) else None
+
     @classmethod
     def from_entity(
         cls,
         name: str,
         entity: typing.List[typing.List[str]],
-        context: typing.List[SnapshotABC],
+        ancestor: typing.Union[None, SnapshotABC],
         side: str,
         config: ConfigABC,
+        lazy: bool = False,
     ) -> SnapshotABC:
 
         properties = {
@@ -190,7 +252,8 @@ class Snapshot(SnapshotABC):
             name=name,
             parent=parent,
             properties=properties,
-            context=context,
+            ancestor=ancestor,
             side=side,
             config=config,
+            lazy=lazy,
         )
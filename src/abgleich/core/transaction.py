@@ -28,14 +28,37 @@ specific language governing rights and limitations under the License.
 # IMPORT
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
 import typing
 
 from tabulate import tabulate
 import typeguard
 
-from .abc import CommandABC, TransactionABC, TransactionListABC, TransactionMetaABC
+from .abc import (
+    CommandABC,
+    TransactionABC,
+    TransactionListABC,
+    TransactionMetaABC,
+    TransactionProgressABC,
+    TransportABC,
+)
+from .command import Command
 from .i18n import t
-from .io import colorize, humanize_size
+from .io import colorize, humanize_size, humanize_time
+from .lib import send_size
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# Upper bound for the length of arguments of merged commands in bytes,
+# well below typical limits of argv and of command lines passed through ssh
+BATCH_MAX_LENGTH = 65536
+
+# Minimum time between two progress reports of a transaction in seconds
+PROGRESS_INTERVAL = 0.5
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS
@@ -45,19 +68,45 @@ from .io import colorize, humanize_size
 @typeguard.typechecked
 class Transaction(TransactionABC):
     def __init__(
-        self, meta: TransactionMetaABC, commands: typing.List[CommandABC],
+        self,
+        meta: TransactionMetaABC,
+        commands: typing.List[CommandABC],
+        batchable: bool = False,
+        transport: typing.Union[None, TransportABC] = None,
     ):
 
         assert len(commands) in (1, 2)
+        if batchable:
+            assert len(commands) == 1
+        if transport is not None:
+            assert len(commands) == 2
 
         self._meta, self._commands = meta, commands
+        self._batchable = batchable
+        self._transport = transport
 
         self._complete = False
         self._running = False
         self._error = None
+        self._progress = None
 
         self._changed = None
 
+    @property
+    def batch_key(self) -> typing.Union[None, typing.Tuple]:
+        """
+        Consecutive batchable transactions with identical keys can be merged
+        into one command, see `Transaction.run_batch`.
+        """
+
+        if not self._batchable:
+            return None
+
+        return (
+            id(self._commands[0].connection),
+            tuple(self._commands[0].args[:-1]),
+        )
+
     @property
     def changed(self) -> typing.Union[None, typing.Callable]:
 
@@ -74,9 +123,9 @@ class Transaction(TransactionABC):
         return self._complete
 
     @property
-    def commands(self) -> typing.Tuple[CommandABC]:
+    def commands(self) -> typing.List[CommandABC]:
 
-        return self._commands
+        return self._commands.copy()
 
     @property
     def error(self) -> typing.Union[Exception, None]:
@@ -88,6 +137,11 @@ class Transaction(TransactionABC):
 
         return self._meta
 
+    @property
+    def progress(self) -> typing.Union[None, TransactionProgressABC]:
+
+        return self._progress
+
     @property
     def running(self) -> bool:
 
@@ -98,24 +152,220 @@ class Transaction(TransactionABC):
         if self._complete:
             return
 
-        self._running = True
-        if self._changed is not None:
-            self._changed()
+        self._start()
 
         try:
             if len(self._commands) == 1:
                 output, errors = self._commands[0].run()
             else:
-                errors_1, output_2, errors_2 = self._commands[0].run_pipe(
-                    self._commands[1]
-                )
+                size = self._meta.get(t("size"))
+                if size is None and (
+                    self._transport is None or not self._transport.estimates
+                ):
+                    size = send_size(self._commands[0])
+                self._progress = TransactionProgress(size=size)
+                if self._transport is None:
+                    errors_1, output_2, errors_2 = self._commands[0].run_pipe(
+                        self._commands[1], progress=self._update_progress,
+                    )
+                else:
+                    errors_1, output_2, errors_2 = self._transport.run(
+                        self._commands[0],
+                        self._commands[1],
+                        progress=self._update_progress,
+                        size=self._update_size,
+                        wire=self._update_wire,
+                    )
         except SystemError as error:
             self._error = error
         finally:
-            self._running = False
-            self._complete = True
-            if self._changed is not None:
-                self._changed()
+            self._finish()
+
+    def _update_progress(self, length: int):
+
+        if self._progress.update(length) and self._changed is not None:
+            self._changed()
+
+    def _update_size(self, size: int):
+
+        if self._progress.size is None:
+            self._progress.size = size
+
+    def _update_wire(self, length: int):
+        """
+        Records the achieved compression ratio, i.e. transferred bytes of the
+        stream as reported by `zfs send` per compressed byte (`length`).
+        """
+
+        if length == 0:
+            return
+
+        self._progress.ratio = self._progress.transferred / length
+        self._meta[t("compression_ratio")] = round(self._progress.ratio, 2)
+
+    def _start(self):
+
+        self._running = True
+        if self._changed is not None:
+            self._changed()
+
+    def _finish(self):
+
+        if self._progress is not None:
+            self._progress.stop()
+        self._running = False
+        self._complete = True
+        if self._changed is not None:
+            self._changed()
+
+    @classmethod
+    def run_batch(cls, transactions: typing.List[TransactionABC]):
+        """
+        Runs transactions with identical batch keys as one merged command.
+        The merged command either succeeds or fails as a whole, its result
+        is reported back to each transaction.
+        """
+
+        if len(transactions) == 1:
+            transactions[0].run()
+            return
+
+        assert all((transaction.batch_key is not None for transaction in transactions))
+        assert len({transaction.batch_key for transaction in transactions}) == 1
+        assert not any((transaction.complete for transaction in transactions))
+
+        command = cls.batch_command(transactions)
+
+        for transaction in transactions:
+            transaction._start()
+
+        try:
+            output, errors = command.run()
+        except SystemError as error:
+            for transaction in transactions:
+                transaction._error = error
+        finally:
+            for transaction in transactions:
+                transaction._finish()
+
+    @staticmethod
+    def batch_command(transactions: typing.List[TransactionABC]) -> CommandABC:
+
+        return Command.join([transaction.commands[0] for transaction in transactions])
+
+
+@typeguard.typechecked
+class TransactionProgress(TransactionProgressABC):
+    """
+    Counts bytes of a running transfer, derives current and average
+    rates and, if the size of the transfer is known, an ETA.
+    """
+
+    def __init__(self, size: typing.Union[None, int] = None):
+
+        self._size = size
+        self._transferred = 0
+        self._ratio = None  # compression
+
+        self._start = time.monotonic()
+        self._stop = None
+
+        self._last_time = self._start
+        self._last_transferred = 0
+        self._rate = 0.0
+
+    def __str__(self) -> str:
+
+        if self._stop is not None:
+            text = (
+                f"{humanize_size(self._transferred):s} | {humanize_time(self.elapsed):s}"
+                f" ({t('average'):s} {humanize_size(self.average):s}/s)"
+            )
+            if self.ratio is not None:
+                text += f" | {t('compression_ratio'):s} {self.ratio:.02f}"
+            return text
+
+        text = humanize_size(self._transferred)
+        if self._size is not None:
+            text += f" / ~{humanize_size(self._size):s}"
+        text += f" | {humanize_size(self._rate):s}/s"
+        text += f" ({t('average'):s} {humanize_size(self.average):s}/s)"
+        if self.eta is not None:
+            text += f" | {t('ETA'):s} {humanize_time(self.eta):s}"
+
+        return text
+
+    @property
+    def average(self) -> float:
+
+        if self.elapsed == 0:
+            return 0.0
+        return self._transferred / self.elapsed
+
+    @property
+    def elapsed(self) -> float:
+
+        return (time.monotonic() if self._stop is None else self._stop) - self._start
+
+    @property
+    def eta(self) -> typing.Union[None, float]:
+
+        if self._size is None or self._stop is not None or self.average == 0:
+            return None
+        return max(self._size - self._transferred, 0) / self.average
+
+    @property
+    def rate(self) -> float:
+
+        return self._rate
+
+    @property
+    def ratio(self) -> typing.Union[None, float]:
+
+        return self._ratio
+
+    @ratio.setter
+    def ratio(self, value: typing.Union[None, float]):
+
+        self._ratio = value
+
+    @property
+    def size(self) -> typing.Union[None, int]:
+
+        return self._size
+
+    @size.setter
+    def size(self, value: typing.Union[None, int]):
+
+        self._size = value
+
+    @property
+    def transferred(self) -> int:
+
+        return self._transferred
+
+    def stop(self):
+
+        self._stop = time.monotonic()
+
+    def update(self, length: int) -> bool:
+        """
+        Counts transferred bytes. Returns `True` if a new report is due,
+        i.e. if the current rate has been updated.
+        """
+
+        self._transferred += length
+
+        now = time.monotonic()
+        if now - self._last_time < PROGRESS_INTERVAL:
+            return False
+
+        self._rate = (self._transferred - self._last_transferred) / (
+            now - self._last_time
+        )
+        self._last_time, self._last_transferred = now, self._transferred
+
+        return True
 
 
 MetaTypes = typing.Union[str, int, float]
@@ -132,6 +382,10 @@ class TransactionMeta(TransactionMetaABC):
 
         return self._meta[key]
 
+    def __setitem__(self, key: str, value: MetaTypes):
+
+        self._meta[key] = value
+
     def __len__(self) -> int:
 
         return len(self._meta)
@@ -177,6 +431,48 @@ class TransactionList(TransactionListABC):
 
         self._changed = value
 
+    @property
+    def batches(self) -> typing.Generator[typing.List[TransactionABC], None, None]:
+        """
+        Groups consecutive transactions with identical batch keys, bounded
+        by `BATCH_MAX_LENGTH`. All other transactions form batches of one.
+        """
+
+        batch, length = [], 0
+
+        for transaction in self._transactions:
+
+            key = transaction.batch_key
+            size = len(transaction.commands[0].args[-1]) + 1
+
+            if len(batch) > 0 and (
+                key is None
+                or key != batch[0].batch_key
+                or length + size > BATCH_MAX_LENGTH
+            ):
+                yield batch
+                batch, length = [], 0
+
+            batch.append(transaction)
+            length += size
+
+            if key is None:
+                yield batch
+                batch, length = [], 0
+
+        if len(batch) > 0:
+            yield batch
+
+    @property
+    def size(self) -> int:
+        """
+        Sum of estimated sizes of all transfers, see `TransactionList.estimate`.
+        """
+
+        return sum(
+            (transaction.meta.get(t("size")) or 0 for transaction in self._transactions)
+        )
+
     @property
     def table_columns(self) -> typing.List[str]:
 
@@ -207,28 +503,72 @@ class TransactionList(TransactionListABC):
 
         self._transactions.append(transaction)
         if self._changed is not None:
-            self._link_transaction(transaction)
+            self._link_transaction(transaction, len(self._transactions) - 1)
 
     def extend(self, transactions: TransactionIterableTypes):
 
         transactions = list(transactions)
+        offset = len(self._transactions)
         self._transactions.extend(transactions)
         if self._changed is not None:
-            for transaction in transactions:
-                self._link_transaction(transaction)
+            for row, transaction in enumerate(transactions, start=offset):
+                self._link_transaction(transaction, row)
 
     def clear(self):
 
+        for transaction in self._transactions:
+            transaction.changed = None  # rows are gone
         self._transactions.clear()
         self._changed()
 
-    def _link_transaction(self, transaction: TransactionABC):
+    def _link_transaction(self, transaction: TransactionABC, row: int):
+        """
+        Reports changes of a transaction with its row, which is fixed until the
+        list is cleared.
+        """
 
-        transaction.changed = lambda: self._changed(
-            self._transactions.index(transaction)
-        )
+        transaction.changed = lambda: self._changed(row)
         transaction.changed()
 
+    def estimate(self, jobs: int = 1):
+        """
+        Estimates the sizes of all transfers through dry runs (`zfs send -nvP`)
+        and attaches them to the meta data of transactions. Up to `jobs` dry runs
+        are run concurrently.
+        """
+
+        transfers = [
+            transaction
+            for transaction in self._transactions
+            if len(transaction.commands) == 2 and transaction.meta.get(t("size")) is None
+        ]
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            sizes = list(
+                executor.map(
+                    lambda transaction: send_size(transaction.commands[0]), transfers
+                )
+            )
+
+        for transaction, size in zip(transfers, sizes):
+            if size is not None:
+                transaction.meta[t("size")] = size
+
+        if self._changed is not None:
+            self._changed()
+
+    def print_estimate(self, throughput: typing.Union[None, float] = None):
+
+        text = f'{t("total"):s}: {humanize_size(self.size, add_color=True):s}'
+        if throughput is not None and throughput > 0:
+            text += (
+                f' | {t("projected transfer time"):s}: '
+                f"{humanize_time(self.size / throughput):s}"
+                f" ({humanize_size(throughput):s}/s)"
+            )
+
+        print(text)
+
     def print_table(self):
 
         if len(self) == 0:
@@ -255,15 +595,24 @@ class TransactionList(TransactionListABC):
     def _table_format_cell(header: str, value: MetaNoneTypes) -> str:
 
         FORMAT = {
+            t("size"): lambda v: humanize_size(v, add_color=True),
             t("written"): lambda v: humanize_size(v, add_color=True),
         }
 
+        if value is None:
+            return ""
+
         return FORMAT.get(header, str)(value)
 
     @staticmethod
     def _table_colalign(headers: typing.List[str]) -> typing.List[str]:
 
-        RIGHT = (t("written"),)
+        RIGHT = (
+            t("compression_ratio"),
+            t("size"),
+            t("snapshot_count"),
+            t("written"),
+        )
         DECIMAL = tuple()
 
         colalign = []
@@ -279,23 +628,47 @@ class TransactionList(TransactionListABC):
 
     def run(self):
 
-        for transaction in self._transactions:
+        for batch in self.batches:
 
             print(
-                f'({colorize(transaction.meta[t("type")], "white"):s}) '
-                f'{colorize(" | ".join([str(command) for command in transaction.commands]), "yellow"):s}'
+                f'({colorize(batch[0].meta[t("type")], "white"):s}) '
+                f'{colorize(self.batch_str(batch), "yellow"):s}'
             )
 
-            assert not transaction.running
-            assert not transaction.complete
+            assert not any((transaction.running for transaction in batch))
+            assert not any((transaction.complete for transaction in batch))
+
+            if len(batch) == 1 and batch[0].changed is None and sys.stdout.isatty():
+                batch[0].changed = lambda: self._print_progress(batch[0])
 
-            transaction.run()
+            Transaction.run_batch(batch)
 
-            assert not transaction.running
-            assert transaction.complete
+            assert not any((transaction.running for transaction in batch))
+            assert all((transaction.complete for transaction in batch))
 
-            if transaction.error is not None:
+            if batch[0].progress is not None and sys.stdout.isatty():
+                print("\r\033[K", end="")  # clear line of progress output
+
+            if batch[0].error is not None:
                 print(colorize(t("FAILED"), "red"))
-                raise transaction.error
+                raise batch[0].error
             else:
+                if batch[0].progress is not None:
+                    print(str(batch[0].progress))
                 print(colorize(t("OK"), "green"))
+
+    @staticmethod
+    def _print_progress(transaction: TransactionABC):
+
+        if transaction.progress is None or not transaction.running:
+            return
+
+        print(f"\r\033[K{str(transaction.progress):s}", end="", flush=True)
+
+    @staticmethod
+    def batch_str(batch: typing.List[TransactionABC]) -> str:
+
+        if len(batch) > 1:
+            return str(Transaction.batch_command(batch))
+
+        return " | ".join([str(command) for command in batch[0].commands])
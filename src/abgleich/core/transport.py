@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    src/abgleich/core/transport.py: Data channels between zfs send and receive
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import re
+import secrets
+import shlex
+import threading
+import typing
+
+import typeguard
+
+from .abc import CommandABC, ConfigABC, TransportABC
+from .command import Command
+from .connection import SSHConnection
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+STATUS_MARKER = "ABGLEICH_STATUS"  # prefix of exit statuses reported through stderr
+TRANSPORTS = ("ssh", "ssh+mbuffer", "tcp")
+COMPRESSIONS = ("zstd", "lz4")
+TOPOLOGIES = ("relay", "direct")
+CONNECT_RETRIES = 50  # attempts of the sender to reach the listener (tcp)
+CONNECT_INTERVAL = 0.1  # seconds between attempts
+LISTEN_TIMEOUT = 30  # seconds a listener waits for the sender (tcp)
+NETCAT_OPTION = re.compile(r"^\s*-N\s", re.MULTILINE)  # in usage of OpenBSD netcat
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@typeguard.typechecked
+class Transport(TransportABC):
+    """
+    Data channel of backups between `zfs send` and `zfs receive`.
+
+    `ssh` (default) relays data through the controlling machine (`relay`) or
+    sends it from source to target through ssh (`direct`). `ssh+mbuffer` does the
+    same with `mbuffer` on both ends. `tcp` sends data unencrypted from source to
+    target through `nc`. The target listens on a port and only accepts a stream
+    which starts with a random token.
+
+    Optionally, data is compressed (`zstd` or `lz4`) on the source and decompressed
+    on the target, unless it is sent compressed (`zfs send -c`) and the dataset
+    already reports a `compressratio` of at least `skip_ratio`.
+    """
+
+    _ports = set()  # tcp ports in use
+    _ports_condition = threading.Condition()
+    _netcat = {}  # (host, user) -> netcat supports `-N`
+
+    def __init__(
+        self,
+        transport: str = "ssh",
+        topology: str = "relay",
+        buffer: str = "1G",
+        address: typing.Union[None, str] = None,
+        port: int = 8023,
+        ports: int = 1,
+        compression: typing.Union[None, str] = None,
+        level: typing.Union[None, int] = None,
+        threads: int = 0,
+        compressratio: typing.Union[None, float] = None,
+        skip_ratio: float = 1.5,
+    ):
+
+        assert transport in TRANSPORTS
+        assert topology in TOPOLOGIES
+        assert compression is None or compression in COMPRESSIONS
+        assert threads >= 0
+        if transport == "tcp":
+            assert address is not None
+        assert ports >= 1
+
+        self._transport = transport
+        self._topology = topology
+        self._buffer = buffer
+        self._address = address
+        self._port = port
+        self._ports_range = ports
+        self._compression = compression
+        self._level = level
+        self._threads = threads
+        self._compressratio = compressratio
+        self._skip_ratio = skip_ratio
+
+    def __str__(self) -> str:
+
+        if self._transport == "tcp":
+            return self._transport
+        return f"{self._transport:s} ({self._topology:s})"
+
+    @property
+    def estimates(self) -> bool:
+        """
+        Size and progress (of the uncompressed stream) are reported by
+        `zfs send -v -P`. This is the case unless data is simply relayed from
+        `zfs send` into `zfs receive`, i.e. unless `ssh` is used without
+        compression and topology `relay`.
+        """
+
+        return (
+            self._transport != "ssh"
+            or self._topology == "direct"
+            or self._compression is not None
+        )
+
+    @property
+    def compression(self) -> typing.Union[None, str]:
+
+        return self._compression
+
+    @property
+    def topology(self) -> str:
+
+        return self._topology
+
+    @property
+    def transport(self) -> str:
+
+        return self._transport
+
+    def run(
+        self,
+        send: CommandABC,
+        receive: CommandABC,
+        progress: typing.Union[None, typing.Callable[[int], None]] = None,
+        size: typing.Union[None, typing.Callable[[int], None]] = None,
+        wire: typing.Union[None, typing.Callable[[int], None]] = None,
+    ) -> typing.Tuple[str, str, str]:
+        """
+        Streams the output of `zfs send` into `zfs receive`. `progress` is called
+        with the number of newly transferred bytes, `size` with the estimated size
+        if it is reported. If data is compressed, `wire` is called with the number
+        of compressed bytes once the transfer is complete. Raises `SystemError`
+        if the transfer fails.
+        """
+
+        assert send.args[:2] == ["zfs", "send"]
+
+        return self._run(send, receive, self.compresses(send), progress, size, wire)
+
+    def probe(self, send: CommandABC, receive: CommandABC):
+        """
+        Streams the output of an arbitrary command on the source into a command on
+        the target through the same channel as backups, e.g. for measuring the
+        throughput. Data is compressed if compression is configured. Raises
+        `SystemError` if the transfer fails.
+        """
+
+        self._run(send, receive, self._compression is not None, None, None, None)
+
+    def _run(
+        self,
+        send: CommandABC,
+        receive: CommandABC,
+        compress: bool,
+        progress: typing.Union[None, typing.Callable[[int], None]],
+        size: typing.Union[None, typing.Callable[[int], None]],
+        wire: typing.Union[None, typing.Callable[[int], None]],
+    ) -> typing.Tuple[str, str, str]:
+
+        if self._transport == "tcp":
+            return self._run_tcp(send, receive, compress, progress, size, wire)
+        if self._topology == "direct":
+            return self._run_direct(send, receive, compress, progress, size, wire)
+        return self._run_relay(send, receive, compress, progress, size, wire)
+
+    def compresses(self, send: CommandABC) -> bool:
+        """
+        Compression is skipped for raw (encrypted) streams and for streams of
+        already well compressed datasets, which are sent compressed.
+        """
+
+        if self._compression is None or "-w" in send.args:
+            return False
+
+        return not (
+            "-c" in send.args
+            and self._compressratio is not None
+            and self._compressratio >= self._skip_ratio
+        )
+
+    def _run_relay(
+        self,
+        send: CommandABC,
+        receive: CommandABC,
+        compress: bool,
+        progress: typing.Union[None, typing.Callable[[int], None]],
+        size: typing.Union[None, typing.Callable[[int], None]],
+        wire: typing.Union[None, typing.Callable[[int], None]],
+    ) -> typing.Tuple[str, str, str]:
+        """
+        Relays data through the controlling machine. With stages (compression or
+        `mbuffer`), both ends are run as pipelines by a local script, so progress
+        is reported by `zfs send -v -P` before compression and every stage reports
+        its exit status.
+        """
+
+        if not self.estimates:
+            return send.run_pipe(receive, progress=progress)
+
+        assert send.connection is not None
+        assert receive.connection is not None
+
+        send.connect()
+        receive.connect()
+
+        sender = send.connection.wrap(["sh", "-c", self._verbose_send(send, compress)])
+        receiver = receive.connection.wrap(
+            ["sh", "-c", self._receive_pipeline(receive, compress)]
+        )
+        script = f"{{ {self._join(sender):s} | {self._join(receiver):s}; }} 2>&1"
+
+        statuses, errors, transferred = self._parse(
+            Command(["sh", "-c", script]).run_stream(), progress, size
+        )
+
+        if self._failed(statuses, "send", "receive"):
+            raise SystemError(
+                "command pipe failed",
+                f"{str(send):s} | {str(receive):s}",
+                errors,
+                "",
+                "",
+            )
+
+        if transferred is not None and wire is not None:
+            wire(transferred)
+
+        return errors, "", ""
+
+    def _run_direct(
+        self,
+        send: CommandABC,
+        receive: CommandABC,
+        compress: bool,
+        progress: typing.Union[None, typing.Callable[[int], None]],
+        size: typing.Union[None, typing.Callable[[int], None]],
+        wire: typing.Union[None, typing.Callable[[int], None]],
+    ) -> typing.Tuple[str, str, str]:
+        """
+        Runs `zfs send` on the source, which pipes its output through ssh into
+        `zfs receive` on the target. The data does not pass the controlling machine.
+        """
+
+        assert isinstance(send.connection, SSHConnection)
+        assert isinstance(receive.connection, SSHConnection)
+
+        remote = receive.connection.wrap(
+            ["sh", "-c", self._receive_pipeline(receive, compress)], shared=False
+        )
+        script = (
+            f"{{ {self._verbose_send(send, compress):s} | "
+            f"{self._join(remote):s}; }} 2>&1"
+        )
+
+        statuses, errors, transferred = self._parse(
+            Command(["sh", "-c", script], connection=send.connection).run_stream(),
+            progress,
+            size,
+        )
+
+        if self._failed(statuses, "send", "receive"):
+            raise SystemError(
+                "command pipe failed",
+                f"{str(send):s} | {str(receive):s}",
+                errors,
+                "",
+                "",
+            )
+
+        if transferred is not None and wire is not None:
+            wire(transferred)
+
+        return errors, "", ""
+
+    def _run_tcp(
+        self,
+        send: CommandABC,
+        receive: CommandABC,
+        compress: bool,
+        progress: typing.Union[None, typing.Callable[[int], None]],
+        size: typing.Union[None, typing.Callable[[int], None]],
+        wire: typing.Union[None, typing.Callable[[int], None]],
+    ) -> typing.Tuple[str, str, str]:
+        """
+        Starts a listener on the target, which checks the token at the beginning
+        of the stream before passing the rest on to `zfs receive`. The source
+        connects, retrying until the listener is up, and sends token and stream.
+        `nc` writes into a FIFO, so a watchdog can kill it if nobody connects
+        within `LISTEN_TIMEOUT` seconds.
+        """
+
+        token = secrets.token_hex(16)
+        port = self._acquire_port()
+
+        listener = Command(
+            [
+                "sh",
+                "-c",
+                'dir="$(mktemp -d)"; mkfifo "$dir/stream"; '
+                f'nc -l {port:d} > "$dir/stream" & listener=$!; '
+                f"{{ sleep {LISTEN_TIMEOUT:d}; kill $listener; }} "
+                "< /dev/null > /dev/null 2>&1 & watchdog=$!; "
+                "( read -r token; kill $watchdog 2> /dev/null; "
+                f'if [ "$token" != {token:s} ]; then echo "handshake failed" >&2; exit 1; fi; '
+                f'{self._receive_pipeline(receive, compress):s} ) < "$dir/stream"; '
+                'status=$?; kill $watchdog 2> /dev/null; rm -r "$dir"; exit $status',
+            ],
+            connection=receive.connection,
+        )
+        sender = (
+            f"{{ {{ echo {token:s}; {self._verbose_send(send, compress):s}; }} | "
+            f"{{ i=0; until nc -N {shlex.quote(self._address):s} {port:d}; do i=$((i+1)); "
+            f"if [ $i -ge {CONNECT_RETRIES:d} ]; then exit 1; fi; sleep {CONNECT_INTERVAL:f}; done; }}; "
+            f"echo {STATUS_MARKER:s} connect $? >&2; }} 2>&1"
+        )
+
+        result, processes = [], []
+        thread = threading.Thread(
+            target=lambda: result.extend(
+                listener.run(returncode=True, started=processes.append)[:3]
+            )
+        )
+        thread.start()
+
+        statuses = {}
+        try:
+            statuses, errors, transferred = self._parse(
+                Command(["sh", "-c", sender], connection=send.connection).run_stream(),
+                progress,
+                size,
+            )
+        finally:
+            if statuses.get("connect") != 0:  # release listener if nobody connected
+                Command(
+                    ["sh", "-c", f"nc -N 127.0.0.1 {port:d} < /dev/null"],
+                    connection=receive.connection,
+                ).run(returncode=True)
+                thread.join(LISTEN_TIMEOUT + CONNECT_RETRIES * CONNECT_INTERVAL)
+                if thread.is_alive():  # watchdog did not stop the listener either
+                    for process in processes:
+                        process.kill()
+            thread.join()
+            self._release_port(port)
+
+        output_2, errors_2, returncode_2 = result
+        statuses_2, errors_2, _ = self._parse(
+            errors_2.encode("utf-8").split(b"\n"), None, None
+        )
+        statuses.update(statuses_2)
+
+        if returncode_2 != 0 or self._failed(statuses, "send", "connect", "receive"):
+            raise SystemError(
+                "command pipe failed",
+                f"{str(send):s} | {str(receive):s}",
+                errors,
+                output_2,
+                errors_2,
+            )
+
+        if transferred is not None and wire is not None:
+            wire(transferred)
+
+        return errors, output_2, errors_2
+
+    def _acquire_port(self) -> int:
+
+        with self._ports_condition:
+            while True:
+                for port in range(self._port, self._port + self._ports_range):
+                    if port not in self._ports:
+                        self._ports.add(port)
+                        return port
+                self._ports_condition.wait()
+
+    def _release_port(self, port: int):
+
+        with self._ports_condition:
+            self._ports.discard(port)
+            self._ports_condition.notify()
+
+    def _compressor(self) -> typing.List[str]:
+
+        level = [] if self._level is None else [f"-{self._level:d}"]
+
+        if self._compression == "zstd":
+            return ["zstd", "-q", "-c", *level, f"-T{self._threads:d}"]
+        return [self._compression, "-q", "-c", *level]
+
+    def _decompressor(self) -> typing.List[str]:
+
+        return [self._compression, "-q", "-d", "-c"]
+
+    def _buffer_stages(self) -> typing.List[typing.List[str]]:
+
+        if self._transport == "ssh+mbuffer":
+            return [["mbuffer", "-q", "-s", "128k", "-m", self._buffer]]
+        return []
+
+    def _send_stages(self, compress: bool) -> typing.List[typing.List[str]]:
+
+        return ([self._compressor()] if compress else []) + self._buffer_stages()
+
+    def _receive_stages(self, compress: bool) -> typing.List[typing.List[str]]:
+
+        return self._buffer_stages() + ([self._decompressor()] if compress else [])
+
+    def _verbose_send(self, send: CommandABC, compress: bool) -> str:
+        """
+        `zfs send -v -P` (or any other command) and stages of the source, each
+        reporting its exit status. Compressed data is counted by `dd`, which
+        reports the number of bytes on stderr.
+        """
+
+        args = send.args
+        if args[:2] == ["zfs", "send"]:
+            args = ["zfs", "send", "-v", "-P", *args[2:]]
+
+        return self._pipeline_status(
+            "send",
+            args,
+            *self._send_stages(compress),
+            *([["dd", "bs=128k"]] if compress else []),
+        )
+
+    def _receive_pipeline(self, receive: CommandABC, compress: bool) -> str:
+        """
+        Stages of the target and `zfs receive`, each reporting its exit status.
+        """
+
+        return self._pipeline_status(
+            "receive", *self._receive_stages(compress), receive.args
+        )
+
+    @classmethod
+    def _pipeline(cls, *cmds: typing.List[str]) -> str:
+
+        return " | ".join([cls._join(cmd) for cmd in cmds])
+
+    @classmethod
+    def _pipeline_status(cls, end: str, *cmds: typing.List[str]) -> str:
+        """
+        Pipeline of which every stage reports its exit status through stderr as
+        `{end}.{program}`, e.g. `send.zfs` and `send.zstd`, because `$?` only holds
+        the status of the last stage and POSIX `sh` has no `pipefail`.
+        """
+
+        return " | ".join(
+            [
+                f"{{ {cls._join(cmd):s}; echo {STATUS_MARKER:s} {end:s}.{cmd[0]:s} $? >&2; }}"
+                for cmd in cmds
+            ]
+        )
+
+    @staticmethod
+    def _failed(statuses: typing.Dict[str, int], *ends: str) -> bool:
+        """
+        Checks exit statuses reported by stages: Every end must have reported,
+        and all stages must have succeeded.
+        """
+
+        for end in ends:
+            reported = [
+                status
+                for name, status in statuses.items()
+                if name == end or name.startswith(f"{end:s}.")
+            ]
+            if len(reported) == 0 or any((status != 0 for status in reported)):
+                return True
+
+        return False
+
+    @staticmethod
+    def _join(cmd: typing.List[str]) -> str:
+
+        return " ".join([shlex.quote(item) for item in cmd])
+
+    @staticmethod
+    def _parse(
+        lines: typing.Iterable[bytes],
+        progress: typing.Union[None, typing.Callable[[int], None]],
+        size: typing.Union[None, typing.Callable[[int], None]],
+    ) -> typing.Tuple[typing.Dict[str, int], str, typing.Union[None, int]]:
+        """
+        Parses the merged stderr of a transfer: exit statuses (markers), progress
+        and size (`zfs send -v -P`) and the number of bytes counted by `dd`, if any.
+        All other lines are returned as errors.
+        """
+
+        statuses, errors, transferred, counted = {}, [], 0, None
+
+        for line in lines:
+
+            line = line.decode("utf-8", errors="replace").rstrip("\r")
+            fields = line.split("\t")
+
+            if line.startswith(f"{STATUS_MARKER:s} "):
+                _, end, status = line.split(" ")
+                statuses[end] = int(status)
+            elif (
+                len(fields) == 3 and fields[0].count(":") == 2 and fields[1].isnumeric()
+            ):
+                if progress is not None:
+                    progress(int(fields[1]) - transferred)
+                transferred = int(fields[1])
+            elif len(fields) == 2 and fields[0] == "size" and fields[1].isnumeric():
+                if size is not None:
+                    size(int(fields[1]))
+            elif len(fields) >= 3 and fields[0] in ("full", "incremental", "resume"):
+                pass
+            elif re.match(r"^\d+\+\d+ records (in|out)$", line) is not None:
+                pass
+            elif re.match(r"^\d+ bytes ", line) is not None:
+                counted = int(line.split(" ")[0])
+            elif len(line) > 0:
+                errors.append(line)
+
+        return statuses, "\n".join(errors), counted
+
+    @classmethod
+    def from_config(
+        cls, config: ConfigABC, compressratio: typing.Union[None, float] = None
+    ) -> TransportABC:
+
+        transfer = config.get("transfer", {})
+        compression = transfer.get("compression", None)
+        transport = transfer.get("transport", "ssh")
+        remote = all(
+            (config[side]["host"] != "localhost" for side in ("source", "target"))
+        )
+
+        address = transfer.get("address", None)
+        if address is None:
+            if (
+                transport == "tcp"
+                and config["target"]["host"] == "localhost"
+                and config["source"]["host"] != "localhost"
+            ):
+                raise ValueError(
+                    'transport "tcp" from a remote source to localhost requires '
+                    'an "address" of the target'
+                )
+            address = config["target"]["host"]
+
+        if transport == "tcp":
+            cls._check_netcat(config)
+
+        return cls(
+            transport=transport,
+            topology=transfer.get("topology", "relay") if remote else "relay",
+            buffer=transfer.get("buffer", "1G"),
+            address=address,
+            port=transfer.get("port", 8023),
+            ports=config.get("jobs", 1),
+            compression=None if compression in (None, False, "none") else compression,
+            level=transfer.get("compression_level", None),
+            threads=transfer.get("compression_threads", 0),
+            compressratio=compressratio,
+            skip_ratio=float(transfer.get("compression_skip_ratio", 1.5)),
+        )
+
+    @classmethod
+    def _check_netcat(cls, config: ConfigABC):
+        """
+        `tcp` relies on OpenBSD netcat, i.e. on `nc -N` closing the connection
+        once the stream ends. Other variants, e.g. GNU or traditional netcat,
+        do not support it and would leave transfers hanging. The usage of `nc`
+        is checked once per host, raises `ValueError` if it is not compatible.
+        """
+
+        for side in ("source", "target"):
+            key = (config[side]["host"], config[side]["user"])
+            if key not in cls._netcat.keys():
+                output, _, _, _ = Command.on_side(
+                    ["sh", "-c", "nc -h 2>&1"], side, config
+                ).run(returncode=True)
+                cls._netcat[key] = NETCAT_OPTION.search(output) is not None
+            if not cls._netcat[key]:
+                raise ValueError(
+                    f'transport "tcp" requires OpenBSD netcat ("nc -N") on the '
+                    f'{side:s} host "{config[side]["host"]:s}"'
+                )
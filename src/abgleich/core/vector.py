@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    src/abgleich/core/vector.py: ZFS comparison based on NumPy arrays
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import typing
+
+try:
+    import numpy as np
+except ImportError:  # optional, see extra "numpy"
+    np = None
+
+import typeguard
+
+from .abc import ComparisonABC, ComparisonItemABC, DatasetABC, SnapshotABC
+from .comparison import (
+    Comparison,
+    ComparisonItem,
+    ComparisonParentTypes,
+    ConflictError,
+)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@typeguard.typechecked
+class VectorComparison(Comparison):
+    """
+    Comparison of the snapshots of two datasets with the same results as
+    `Comparison.from_datasets`. Keys (GUIDs if known for all snapshots, otherwise
+    names) and sizes of the snapshots of both sides are held in NumPy arrays, so
+    heads, overlaps and sums are computed by array operations. Merged items are
+    only created if they are requested.
+    """
+
+    def __init__(
+        self,
+        a: ComparisonParentTypes,
+        b: ComparisonParentTypes,
+        snapshots_a: typing.List[SnapshotABC],
+        snapshots_b: typing.List[SnapshotABC],
+        keys_a: typing.Any,
+        keys_b: typing.Any,
+        offset_a: int = 0,
+        offset_b: int = 0,
+    ):
+
+        super().__init__(a, b, [])
+
+        self._merged = None
+        self._snapshots = {"a": snapshots_a, "b": snapshots_b}
+        self._keys = {"a": keys_a, "b": keys_b}
+        self._unique = {
+            side: len(np.unique(keys)) == len(keys) for side, keys in self._keys.items()
+        }
+        self._offsets = {"a": offset_a, "b": offset_b}
+        self._values = {}
+
+    def __len__(self) -> int:
+
+        return len(self._get_merged())
+
+    @property
+    def a_head(self) -> typing.List[SnapshotABC]:
+
+        start, stop = self._head_range("a", "b")
+        return self._snapshots["a"][start:stop]
+
+    @property
+    def a_overlap_tail(self) -> typing.List[SnapshotABC]:
+
+        start, stop = self._overlap_tail_range("a", "b")
+        return self._snapshots["a"][start:stop]
+
+    @property
+    def b_head(self) -> typing.List[SnapshotABC]:
+
+        start, stop = self._head_range("b", "a")
+        return self._snapshots["b"][start:stop]
+
+    @property
+    def b_overlap_tail(self) -> typing.List[SnapshotABC]:
+
+        start, stop = self._overlap_tail_range("b", "a")
+        return self._snapshots["b"][start:stop]
+
+    @property
+    def merged(self) -> typing.Generator[ComparisonItemABC, None, None]:
+
+        return (item for item in self._get_merged())
+
+    def get_sum(self, name: str, selection: str) -> int:
+
+        assert selection in self.SELECTIONS
+
+        side = selection[0]
+        if selection in ("a", "b"):
+            start, stop = 0, len(self._snapshots[side])
+        elif selection.endswith("_head"):
+            start, stop = self._head_range(side, "b" if side == "a" else "a")
+        else:
+            start, stop = self._overlap_tail_range(side, "b" if side == "a" else "a")
+
+        return int(self._get_values(side, name)[start:stop].sum())
+
+    def _get_merged(self) -> typing.List[ComparisonItemABC]:
+
+        if self._merged is not None:
+            return self._merged
+
+        snapshots_a, snapshots_b = self._snapshots["a"], self._snapshots["b"]
+        offset_a, offset_b = self._offsets["a"], self._offsets["b"]
+
+        self._merged = [
+            ComparisonItem(
+                (
+                    snapshots_a[index - offset_a]
+                    if 0 <= index - offset_a < len(snapshots_a)
+                    else None
+                ),
+                (
+                    snapshots_b[index - offset_b]
+                    if 0 <= index - offset_b < len(snapshots_b)
+                    else None
+                ),
+            )
+            for index in range(
+                max(offset_a + len(snapshots_a), offset_b + len(snapshots_b))
+            )
+        ]
+
+        return self._merged
+
+    def _get_values(self, side: str, name: str) -> typing.Any:
+        """
+        Integer property of all snapshots of one side, fetched once.
+        """
+
+        if (side, name) not in self._values.keys():
+            self._values[(side, name)] = np.array(
+                [snapshot[name].value for snapshot in self._snapshots[side]],
+                dtype=np.int64,
+            )
+
+        return self._values[(side, name)]
+
+    def _head_range(self, source: str, target: str) -> typing.Tuple[int, int]:
+        """
+        Range of new snapshots of source, see `Comparison._head`.
+        """
+
+        source_keys, target_keys = self._keys[source], self._keys[target]
+
+        if not self._unique[source]:
+            raise ValueError("source contains doublicate entires")
+        if not self._unique[target]:
+            raise ValueError("target contains doublicate entires")
+
+        if len(target_keys) == 0:
+            return 0, len(source_keys)  # all of source, target is empty
+
+        source_index = self._find(source_keys, target_keys[-1])
+        if source_index is None:
+            raise ConflictError("last target element not in source")
+
+        length = source_index + 1
+
+        if length <= len(target_keys):
+            if not np.array_equal(target_keys[-length:], source_keys[:length]):
+                raise ConflictError(
+                    "no clean match between end of target and beginning of source"
+                )
+        else:
+            if not np.array_equal(
+                target_keys, source_keys[length - len(target_keys) : length]
+            ):
+                raise ConflictError(
+                    "no clean match between entire target and beginning of source"
+                )
+
+        return length, len(source_keys)
+
+    def _overlap_tail_range(self, source: str, target: str) -> typing.Tuple[int, int]:
+        """
+        Range of snapshots of source also present in target, see
+        `Comparison._overlap_tail`.
+        """
+
+        source_keys, target_keys = self._keys[source], self._keys[target]
+
+        if len(source_keys) == 0 or len(target_keys) == 0:
+            return 0, 0
+
+        if not self._unique[source]:
+            raise ValueError("source contains doublicate entires")
+        if not self._unique[target]:
+            raise ValueError("target contains doublicate entires")
+
+        present = np.isin(source_keys, target_keys)
+        length = len(source_keys) if present.all() else int(np.argmin(present))
+
+        if length == 0:
+            return 0, 0
+
+        target_index = self._find(target_keys, source_keys[0])
+        if not np.array_equal(
+            source_keys[:length], target_keys[target_index : target_index + length]
+        ):
+            raise ConflictError("no clean match in overlap area")
+
+        return 0, length
+
+    @staticmethod
+    def _find(keys: typing.Any, key: typing.Any) -> typing.Union[None, int]:
+
+        indices = np.flatnonzero(keys == key)
+        return int(indices[0]) if len(indices) > 0 else None
+
+    @classmethod
+    def _get_keys(
+        cls,
+        snapshots_a: typing.List[SnapshotABC],
+        snapshots_b: typing.List[SnapshotABC],
+    ) -> typing.Tuple[typing.Any, typing.Any]:
+        """
+        Key arrays of both sides, see `Comparison._identity`. Raises
+        `ConflictError` if snapshots of the same name have different GUIDs on both
+        sides.
+        """
+
+        names_a = np.array([snapshot.name for snapshot in snapshots_a], dtype=str)
+        names_b = np.array([snapshot.name for snapshot in snapshots_b], dtype=str)
+        guids_a = [snapshot.guid for snapshot in snapshots_a]
+        guids_b = [snapshot.guid for snapshot in snapshots_b]
+        known_a = np.array([guid is not None for guid in guids_a], dtype=bool)
+        known_b = np.array([guid is not None for guid in guids_b], dtype=bool)
+        guids_a = np.array(
+            [0 if guid is None else guid for guid in guids_a], dtype=np.uint64
+        )
+        guids_b = np.array(
+            [0 if guid is None else guid for guid in guids_b], dtype=np.uint64
+        )
+
+        _, indices_a, indices_b = np.intersect1d(names_a, names_b, return_indices=True)
+        conflicts = (
+            known_a[indices_a]
+            & known_b[indices_b]
+            & (guids_a[indices_a] != guids_b[indices_b])
+        )
+        if conflicts.any():
+            name = names_a[indices_a[conflicts].min()]
+            raise ConflictError(
+                f'snapshot "{name:s}" differs between both sides (guid)'
+            )
+
+        if len(known_a) + len(known_b) > 0 and known_a.all() and known_b.all():
+            return guids_a, guids_b
+        return names_a, names_b
+
+    @classmethod
+    def from_datasets(
+        cls,
+        dataset_a: typing.Union[DatasetABC, None],
+        dataset_b: typing.Union[DatasetABC, None],
+    ) -> ComparisonABC:
+
+        if np is None:
+            raise ImportError('comparison backend "numpy" requires numpy')
+
+        assert dataset_a is not None or dataset_b is not None
+
+        snapshots_a = [] if dataset_a is None else list(dataset_a.snapshots)
+        snapshots_b = [] if dataset_b is None else list(dataset_b.snapshots)
+
+        if dataset_a is None or dataset_b is None:
+            keys_a, keys_b = cls._get_keys(snapshots_a, snapshots_b)
+            return cls(dataset_a, dataset_b, snapshots_a, snapshots_b, keys_a, keys_b)
+
+        assert dataset_a is not dataset_b
+        assert dataset_a == dataset_b
+
+        assert len({item.name for item in snapshots_a}) == len(snapshots_a)
+        assert len({item.name for item in snapshots_b}) == len(snapshots_b)
+
+        keys_a, keys_b = cls._get_keys(snapshots_a, snapshots_b)
+
+        assert len(np.unique(keys_a)) == len(keys_a)  # unique identities
+        assert len(np.unique(keys_b)) == len(keys_b)  # unique identities
+
+        if len(keys_a) == 0 or len(keys_b) == 0:
+            return cls(dataset_a, dataset_b, snapshots_a, snapshots_b, keys_a, keys_b)
+
+        start_b = cls._find(keys_a, keys_b[0])
+        start_a = cls._find(keys_b, keys_a[0])
+
+        if start_a is None and start_b is None:
+            raise ConflictError("no common snapshot")
+
+        offset_a = 0 if start_a is None else start_a
+        offset_b = 0 if start_b is None else start_b
+
+        if min(offset_a, offset_b) > 0:  # position without snapshots
+            raise ConflictError("inconsistent snapshot names")
+
+        start = max(offset_a, offset_b)
+        stop = min(offset_a + len(keys_a), offset_b + len(keys_b))
+        if not np.array_equal(
+            keys_a[start - offset_a : stop - offset_a],
+            keys_b[start - offset_b : stop - offset_b],
+        ):
+            raise ConflictError("inconsistent snapshot names")
+
+        return cls(
+            dataset_a,
+            dataset_b,
+            snapshots_a,
+            snapshots_b,
+            keys_a,
+            keys_b,
+            offset_a,
+            offset_b,
+        )
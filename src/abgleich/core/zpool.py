@@ -29,28 +29,68 @@ specific language governing rights and limitations under the License.
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import itertools
 import typing
 
+# Python <= 3.7.1 "fix"
+try:
+    from typing import OrderedDict as DictType
+except ImportError:
+    from typing import Dict as DictType
+
 from tabulate import tabulate
 import typeguard
 
 from .abc import (
+    ComparisonABC,
     ComparisonItemABC,
     ConfigABC,
     DatasetABC,
+    SendProfileABC,
     SnapshotABC,
     TransactionABC,
     TransactionListABC,
     ZpoolABC,
 )
-from .command import Command
-from .comparison import Comparison
+from .command import Command, CommandError
+from .comparison import Comparison, ConflictError
 from .dataset import Dataset
 from .i18n import t
 from .io import colorize, humanize_size
-from .lib import join, root
+from .lib import get_features, join, resume_token_snapshot, root
+from .profile import SendProfile
 from .property import Property
-from .transaction import TransactionList
+from .transaction import Transaction, TransactionList, TransactionMeta
+from .transport import Transport
+from .vector import VectorComparison
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+# Properties required for inventories of individual commands, see `Zpool.from_config`
+PROPERTIES = {
+    "tree": ("type", "used", "referenced", "compressratio"),
+    "snap": ("type", "written", "mountpoint"),
+    "compare": ("type", "guid", "createtxg", "written"),
+    "backup": (
+        "type",
+        "guid",
+        "createtxg",
+        "receive_resume_token",
+        "compressratio",
+        "encryption",
+        "encryptionroot",
+    ),
+    "cleanup": ("type", "guid", "createtxg"),
+}
+
+COMPARISON_BACKENDS = {
+    "numpy": VectorComparison,
+    "python": Comparison,
+}
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # CLASS
@@ -69,6 +109,12 @@ class Zpool(ZpoolABC):
 
         self._root = root(config[side]["zpool"], config[side]["prefix"])
 
+        self._comparison = None  # other zpool and comparison with it
+        self._fingerprints = None
+        self._send_profiles = None
+        self._features = None  # side -> enabled zpool features
+        self._conflicts = {}  # subname -> reason
+
     def __eq__(self, other: ZpoolABC) -> bool:
 
         return self.side == other.side
@@ -83,17 +129,95 @@ class Zpool(ZpoolABC):
 
         return self._side
 
+    @property
+    def conflicts(self) -> typing.Dict[str, str]:
+        """
+        Datasets skipped by the last planned backup or cleanup because their
+        snapshots have diverged between both sides, see `ConflictError`, and the
+        reasons.
+        """
+
+        return self._conflicts.copy()
+
     @property
     def root(self) -> str:
 
         return self._root
 
+    def get_fingerprint(self, subname: str) -> typing.Union[None, str]:
+        """
+        Merkle fingerprint of the subtree below (and including) a dataset, combining
+        the fingerprint of the dataset with the names and fingerprints of its
+        children. `None` if any fingerprint within the subtree is unknown.
+        """
+
+        if self._fingerprints is None:
+            self._load_fingerprints()
+
+        return self._fingerprints.get(subname, None)
+
+    def _load_fingerprints(self):
+
+        datasets = {dataset.subname: dataset for dataset in self._datasets}
+        children = {}
+        for subname in datasets.keys():
+            if len(subname) > 0:
+                children.setdefault(subname.rpartition("/")[0], []).append(subname)
+
+        fingerprints = {}
+        for subname in sorted(
+            datasets.keys(),
+            key=lambda subname: -1 if len(subname) == 0 else subname.count("/"),
+            reverse=True,
+        ):  # children before parents
+            own = datasets[subname].fingerprint
+            subtree = sorted(children.get(subname, []))
+            if own is None or any((fingerprints[child] is None for child in subtree)):
+                fingerprints[subname] = None
+                continue
+            fingerprint = hashlib.sha256(own.encode("utf-8"))
+            for child in subtree:
+                fingerprint.update(
+                    f"{child:s}\t{fingerprints[child]:s}\n".encode("utf-8")
+                )
+            fingerprints[subname] = fingerprint.hexdigest()
+
+        self._fingerprints = fingerprints
+
+    def get_comparison(self, other: ZpoolABC) -> ComparisonABC:
+        """
+        Compares the datasets of both inventories with the configured backend,
+        once per pair of inventories. The comparison is shared by all operations
+        on this pair, and so are the comparisons of the snapshots of individual
+        datasets, which are only computed when an operation needs them, see
+        `ComparisonItem.comparison`. Reloading an inventory yields a new zpool,
+        which is compared from scratch.
+        """
+
+        if self._comparison is None or self._comparison[0] is not other:
+            self._comparison = (
+                other,
+                Comparison.from_zpools(self, other, self._get_comparison_backend()),
+            )
+
+        return self._comparison[1]
+
+    def _get_comparison_backend(self) -> typing.Type[ComparisonABC]:
+
+        backend = self._config.get("comparison_backend", "python")
+
+        if backend not in COMPARISON_BACKENDS.keys():
+            raise ValueError(f'unknown comparison backend "{backend:s}"')
+
+        return COMPARISON_BACKENDS[backend]
+
     def get_cleanup_transactions(self, other: ZpoolABC,) -> TransactionListABC:
 
         assert self.side == "source"
         assert other.side == "target"
 
-        zpool_comparison = Comparison.from_zpools(self, other)
+        self._conflicts.clear()
+        zpool_comparison = self.get_comparison(other)
         transactions = TransactionList()
 
         for dataset_item in zpool_comparison.merged:
@@ -121,7 +245,8 @@ class Zpool(ZpoolABC):
         assert self.side == "source"
         assert other.side == "target"
 
-        zpool_comparison = Comparison.from_zpools(self, other)
+        self._conflicts.clear()
+        zpool_comparison = self.get_comparison(other)
 
         yield len(zpool_comparison), None
 
@@ -137,17 +262,26 @@ class Zpool(ZpoolABC):
         if dataset_item.a is None or dataset_item.b is None:
             return
 
-        dataset_comparison = Comparison.from_datasets(dataset_item.a, dataset_item.b)
-        snapshots = dataset_comparison.a_overlap_tail[: -self._config["keep_snapshots"]]
+        try:
+            snapshots = dataset_item.comparison.a_overlap_tail[
+                : -self._config["keep_snapshots"]
+            ]
+        except ConflictError as error:
+            self._conflicts[dataset_item.a.subname] = str(error)
+            return
+
+        if len(snapshots) == 0:
+            return
 
-        return (snapshot.get_cleanup_transaction() for snapshot in snapshots)
+        return dataset_item.a.get_cleanup_transactions(snapshots)
 
     def get_backup_transactions(self, other: ZpoolABC,) -> TransactionListABC:
 
         assert self.side == "source"
         assert other.side == "target"
 
-        zpool_comparison = Comparison.from_zpools(self, other)
+        self._conflicts.clear()
+        zpool_comparison = self.get_comparison(other)
         transactions = TransactionList()
 
         for dataset_item in zpool_comparison.merged:
@@ -158,6 +292,8 @@ class Zpool(ZpoolABC):
                 continue
             transactions.extend(backup_transactions)
 
+        transactions.estimate(jobs=self._config["source"].get("jobs", 4))
+
         return transactions
 
     def generate_backup_transactions(
@@ -176,7 +312,8 @@ class Zpool(ZpoolABC):
         assert self.side == "source"
         assert other.side == "target"
 
-        zpool_comparison = Comparison.from_zpools(self, other)
+        self._conflicts.clear()
+        zpool_comparison = self.get_comparison(other)
 
         yield len(zpool_comparison), None
 
@@ -193,17 +330,27 @@ class Zpool(ZpoolABC):
             return
         if dataset_item.a is None:
             return
+        if self._in_sync(other, dataset_item.a.subname):
+            return
+
+        try:
+            return self._plan_backup(other, dataset_item)
+        except ConflictError as error:
+            self._conflicts[dataset_item.a.subname] = str(error)
+            return
+
+    def _plan_backup(
+        self, other: ZpoolABC, dataset_item: ComparisonItemABC,
+    ) -> typing.Union[None, typing.Generator[TransactionABC, None, None]]:
+        """
+        Transactions bringing the target of a dataset up to date. Raises
+        `ConflictError` if the dataset can not be backed up.
+        """
 
         if dataset_item.b is None:
             snapshots = list(dataset_item.a.snapshots)
         else:
-            dataset_comparison = Comparison.from_datasets(
-                dataset_item.a, dataset_item.b
-            )
-            snapshots = dataset_comparison.a_head
-
-        if len(snapshots) == 0:
-            return
+            snapshots = dataset_item.comparison.a_head
 
         source_dataset = (
             self.root
@@ -216,9 +363,216 @@ class Zpool(ZpoolABC):
             else join(other.root, dataset_item.a.subname)
         )
 
+        resume_transaction = None
+        if dataset_item.b is not None:
+            token = dataset_item.b.get("receive_resume_token").value
+            if token is not None:
+                resume_transaction, snapshots = self._get_resume_transaction(
+                    token, dataset_item.a.subname, snapshots, target_dataset
+                )
+
+        if len(snapshots) == 0:
+            if resume_transaction is None:
+                return None
+            return self._chain_transactions((resume_transaction,))
+
+        profile = self._get_send_profile(dataset_item.a.subname)
+        if dataset_item.b is not None:
+            self._check_raw(other, dataset_item, profile)
+
+        if self._config.get("send_intermediary", False):
+            transactions = self._get_range_backup_transactions(
+                snapshots, source_dataset, target_dataset, profile
+            )
+        else:
+            transactions = (
+                snapshot.get_backup_transaction(
+                    source_dataset, target_dataset, profile=profile
+                )
+                for snapshot in snapshots
+            )
+
+        if resume_transaction is None:
+            return transactions
+        return self._chain_transactions((resume_transaction,), transactions)
+
+    def _check_raw(
+        self, other: ZpoolABC, dataset_item: ComparisonItemABC, profile: SendProfileABC
+    ):
+        """
+        Raises `ConflictError` if incremental streams of an encrypted dataset would be
+        sent raw (`zfs send -w`) into a target which was first received non-raw, or
+        vice versa. A target received raw is encrypted and has the same encryption
+        root (relative to the prefix) as the source.
+        """
+
+        encryption_a = dataset_item.a.get("encryption").value
+        encryption_b = dataset_item.b.get("encryption").value
+        if encryption_a in (None, "off"):
+            return  # not encrypted or unknown
+
+        if encryption_b in (None, "off"):
+            raw = False
+        else:
+            root_a = dataset_item.a.get("encryptionroot").value
+            root_b = dataset_item.b.get("encryptionroot").value
+            if root_a is None or root_b is None:
+                return  # unknown
+            raw = self._relative(root_a, self.root) == self._relative(
+                root_b, other.root
+            )
+
+        if raw == ("raw" in profile.flags):
+            return
+
+        raise ConflictError(
+            f'send profile "{profile.name:s}" sends '
+            f'{"raw" if "raw" in profile.flags else "non-raw":s} streams, but '
+            f'"{dataset_item.b.name:s}" was received '
+            f'{"raw" if raw else "non-raw":s}'
+        )
+
+    @staticmethod
+    def _relative(name: str, root: str) -> str:
+
+        if name == root:
+            return ""
+        if name.startswith(f"{root:s}/"):
+            return name[len(root) + 1 :]
+        return f"/{name:s}"  # outside of root, never equal to a relative name
+
+    def _in_sync(self, other: ZpoolABC, subname: str) -> bool:
+        """
+        A dataset is in sync if the fingerprints of its subtree, or of the subtree
+        of any of its parents, are equal on both sides. Its snapshots do not need
+        to be compared then.
+        """
+
+        while True:
+            fingerprint = self.get_fingerprint(subname)
+            if fingerprint is not None and fingerprint == other.get_fingerprint(subname):
+                return True
+            if len(subname) == 0:
+                return False
+            subname = subname.rpartition("/")[0]
+
+    @staticmethod
+    def _chain_transactions(
+        *transactions: typing.Iterable[TransactionABC],
+    ) -> typing.Generator[TransactionABC, None, None]:
+
+        yield from itertools.chain(*transactions)
+
+    def _get_resume_transaction(
+        self,
+        token: str,
+        subname: str,
+        snapshots: typing.List[SnapshotABC],
+        target_dataset: str,
+    ) -> typing.Tuple[TransactionABC, typing.List[SnapshotABC]]:
+        """
+        Continues an interrupted transfer from its `receive_resume_token`.
+        Returns the transaction and the snapshots which still need to be sent
+        afterwards. If the transfer can not be resumed, e.g. because its snapshot
+        is gone on the source, its partial state is discarded instead.
+        """
+
+        snapshot_name = resume_token_snapshot(token, "source", self._config)
+
+        if snapshot_name is None:
+            return (
+                Transaction(
+                    meta=TransactionMeta(
+                        **{
+                            t("type"): t("abort_transfer"),
+                            t("dataset_subname"): subname,
+                        }
+                    ),
+                    commands=[
+                        Command.on_side(
+                            ["zfs", "receive", "-A", target_dataset],
+                            "target",
+                            self._config,
+                        )
+                    ],
+                ),
+                snapshots,
+            )
+
+        names = [snapshot.name for snapshot in snapshots]
+        if snapshot_name in names:
+            snapshots = snapshots[names.index(snapshot_name) + 1 :]
+
         return (
-            snapshot.get_backup_transaction(source_dataset, target_dataset,)
-            for snapshot in snapshots
+            Transaction(
+                meta=TransactionMeta(
+                    **{
+                        t("type"): t("resume_transfer"),
+                        t("snapshot_subparent"): subname,
+                        t("snapshot_name"): snapshot_name,
+                    }
+                ),
+                commands=[
+                    Command.on_side(
+                        ["zfs", "send", "-t", token], "source", self._config
+                    ),
+                    Command.on_side(
+                        ["zfs", "receive", "-s", target_dataset],
+                        "target",
+                        self._config,
+                    ),
+                ],
+                transport=Transport.from_config(self._config),
+            ),
+            snapshots,
+        )
+
+    def _get_send_profile(self, subname: str) -> SendProfileABC:
+        """
+        First configured send profile matching a dataset. Profiles requiring
+        zpool features are validated against both sides before they are used.
+        """
+
+        if self._send_profiles is None:
+            self._send_profiles = SendProfile.from_config(self._config)
+
+        profile = next(
+            (profile for profile in self._send_profiles if profile.matches(subname))
+        )
+
+        if len(profile.features) > 0:
+            if self._features is None:
+                self._features = {
+                    side: get_features(side, self._config)
+                    for side in ("source", "target")
+                }
+            profile.validate(self._features)
+
+        return profile
+
+    @staticmethod
+    def _get_range_backup_transactions(
+        snapshots: typing.List[SnapshotABC],
+        source_dataset: str,
+        target_dataset: str,
+        profile: SendProfileABC,
+    ) -> typing.Generator[TransactionABC, None, None]:
+        """
+        Sends all new snapshots of a dataset as one incremental stream.
+        New datasets require an initial full stream of their first snapshot.
+        """
+
+        if snapshots[0].ancestor is None:
+            yield snapshots[0].get_backup_transaction(
+                source_dataset, target_dataset, profile=profile
+            )
+            snapshots = snapshots[1:]
+
+        if len(snapshots) == 0:
+            return
+
+        yield snapshots[0].get_backup_transaction(
+            source_dataset, target_dataset, last=snapshots[-1], profile=profile
         )
 
     def get_snapshot_transactions(self) -> TransactionListABC:
@@ -227,11 +581,12 @@ class Zpool(ZpoolABC):
 
         transactions = TransactionList()
 
-        for dataset in self._datasets:
-            transaction = self._get_snapshot_transactions_from_dataset(dataset)
+        for transaction in self._map_datasets(
+            self._get_snapshot_transactions_from_dataset
+        ):
             if transaction is None:
                 continue
-            transactions.append(dataset.get_snapshot_transaction())
+            transactions.append(transaction)
 
         return transactions
 
@@ -245,8 +600,24 @@ class Zpool(ZpoolABC):
 
         yield len(self._datasets), None
 
-        for index, dataset in enumerate(self._datasets):
-            yield index, self._get_snapshot_transactions_from_dataset(dataset)
+        for index, transaction in enumerate(
+            self._map_datasets(self._get_snapshot_transactions_from_dataset)
+        ):
+            yield index, transaction
+
+    def _map_datasets(
+        self, func: typing.Callable
+    ) -> typing.Generator[typing.Any, None, None]:
+        """
+        Applies func to all datasets concurrently, e.g. for running `zfs diff`.
+        Results are yielded in the order of datasets. The number of workers
+        is limited per host by the `jobs` option of the side.
+        """
+
+        with ThreadPoolExecutor(
+            max_workers=self._config[self._side].get("jobs", 4)
+        ) as executor:
+            yield from executor.map(func, self._datasets)
 
     def _get_snapshot_transactions_from_dataset(
         self, dataset: DatasetABC
@@ -265,12 +636,22 @@ class Zpool(ZpoolABC):
         return dataset.get_snapshot_transaction()
 
     def print_table(self):
+        """
+        Prints datasets and snapshots. Datasets also show the sum of `used` of
+        their snapshots, i.e. the space unique to individual snapshots.
+        """
+
+        backend = self._get_comparison_backend()
+        table, total = [], 0
 
-        table = []
         for dataset in self._datasets:
-            table.append(self._table_row(dataset))
+            used = backend.from_datasets(dataset, None).get_sum("used", "a")
+            total += used
+            table.append(
+                self._table_row(dataset) + [humanize_size(used, add_color=True)]
+            )
             for snapshot in dataset.snapshots:
-                table.append(self._table_row(snapshot))
+                table.append(self._table_row(snapshot) + [""])
 
         if len(table) == 0:
             print('(empty)')
@@ -279,11 +660,18 @@ class Zpool(ZpoolABC):
         print(
             tabulate(
                 table,
-                headers=(t("NAME"), t("USED"), t("REFER"), t("compressratio")),
+                headers=(
+                    t("NAME"),
+                    t("USED"),
+                    t("REFER"),
+                    t("compressratio"),
+                    t("SNAPSHOTS"),
+                ),
                 tablefmt="github",
-                colalign=("left", "right", "right", "decimal"),
+                colalign=("left", "right", "right", "decimal", "right"),
             )
         )
+        print(f'{t("total"):s}: {humanize_size(total, add_color=True):s}')
 
     @staticmethod
     def _table_row(entity: typing.Union[SnapshotABC, DatasetABC]) -> typing.List[str]:
@@ -298,30 +686,59 @@ class Zpool(ZpoolABC):
         ]
 
     def print_comparison_table(self, other: ZpoolABC):
+        """
+        Prints datasets and snapshots of both sides. Datasets also show the sum
+        of `written` of the new snapshots of this side, i.e. roughly the size of
+        the next backup of the dataset.
+        """
 
-        zpool_comparison = Comparison.from_zpools(self, other)
-        table = []
+        zpool_comparison = self.get_comparison(other)
+        table, total = [], 0
 
         for dataset_item in zpool_comparison.merged:
-            table.append(self._comparison_table_row(dataset_item))
-            if dataset_item.complete:
-                dataset_comparison = Comparison.from_datasets(
-                    dataset_item.a, dataset_item.b
+            row = self._comparison_table_row(dataset_item)
+            try:
+                snapshot_items = list(dataset_item.comparison.merged)
+                written = (
+                    dataset_item.comparison.get_sum("written", "a_head")
+                    if dataset_item.a is not None
+                    else None
+                )
+            except ConflictError as error:
+                table.append(row + [""])
+                table.append(
+                    ["- " + colorize(f'{t("conflict"):s}: {str(error):s}', "red")]
                 )
-            elif dataset_item.a is not None:
-                dataset_comparison = Comparison.from_datasets(dataset_item.a, None)
-            else:
-                dataset_comparison = Comparison.from_datasets(None, dataset_item.b)
-            for snapshot_item in dataset_comparison.merged:
-                table.append(self._comparison_table_row(snapshot_item))
+                continue
+            if written is not None:
+                total += written
+            table.append(
+                row
+                + ["" if written is None else humanize_size(written, add_color=True)]
+            )
+            for snapshot_item in snapshot_items:
+                table.append(self._comparison_table_row(snapshot_item) + [""])
 
         print(
             tabulate(
                 table,
-                headers=[t("NAME"), t(self.side), t(other.side)],
+                headers=[t("NAME"), t(self.side), t(other.side), t("NEW")],
                 tablefmt="github",
+                colalign=("left", "left", "left", "right"),
             )
         )
+        print(f'{t("total"):s}: {humanize_size(total, add_color=True):s}')
+
+    def print_conflicts(self):
+
+        for subname, reason in self._conflicts.items():
+            print(
+                colorize(
+                    f'{t("conflict"):s}: {subname if len(subname) > 0 else self.root:s}: '
+                    f'{reason:s} ({t("skipped"):s})',
+                    "red",
+                )
+            )
 
     @staticmethod
     def _comparison_table_row(item: ComparisonItemABC) -> typing.List[str]:
@@ -362,50 +779,138 @@ class Zpool(ZpoolABC):
 
         return Property.from_params(*output.strip().split("\t")[1:]).value
 
-    @classmethod
-    def from_config(cls, side: str, config: ConfigABC,) -> ZpoolABC:
+    @staticmethod
+    def _group_entities(
+        records: typing.Iterable[typing.Tuple[str, str, str, str]],
+    ) -> DictType[str, DictType[str, typing.List[typing.List[str]]]]:
+        """
+        Groups (entity, property, value, source) records by dataset in a single pass.
+        Snapshots are sorted into the bucket of their parent dataset.
+        """
+
+        entities = OrderedDict()
+
+        for name, *params in records:
+            dataset_name, _, _ = name.partition("@")
+            dataset_entities = entities.get(dataset_name, None)
+            if dataset_entities is None:
+                dataset_entities = entities[dataset_name] = OrderedDict()
+            entity = dataset_entities.get(name, None)
+            if entity is None:
+                entity = dataset_entities[name] = []
+            entity.append(params)
+
+        return entities
 
-        root_dataset = root(config[side]["zpool"], config[side]["prefix"])
+    @staticmethod
+    def _parse_get(
+        lines: typing.Iterable[bytes],
+    ) -> typing.Generator[typing.Tuple[str, str, str, str], None, None]:
+        """
+        Parses output of `zfs get -H -p`, one property per line.
+        """
+
+        for line in lines:
+            if len(line.strip()) == 0:
+                continue
+            name, property_name, value, src = line.decode("utf-8").split("\t")
+            yield name, property_name, value, src
+
+    @staticmethod
+    def _parse_list(
+        lines: typing.Iterable[bytes], properties: typing.Tuple[str, ...],
+    ) -> typing.Generator[typing.Tuple[str, str, str, str], None, None]:
+        """
+        Parses output of `zfs list -H -p -o name,...`, one entity per line.
+        `zfs list` does not report sources.
+        """
+
+        for line in lines:
+            if len(line.strip()) == 0:
+                continue
+            name, *values = line.decode("utf-8").split("\t")
+            assert len(values) == len(properties)
+            for property_name, value in zip(properties, values):
+                yield name, property_name, value, "-"
 
-        output, errors, returncode, exception = Command.on_side(
-            ["zfs", "get", "all", "-r", "-H", "-p", root_dataset,], side, config,
-        ).run(returncode = True)
+    @classmethod
+    def from_config(
+        cls,
+        side: str,
+        config: ConfigABC,
+        properties: typing.Union[None, typing.Tuple[str, ...]] = None,
+    ) -> ZpoolABC:
+        """
+        Loads the inventory of one side. If `properties` is `None`, all properties
+        are loaded. Otherwise, only the listed properties are loaded upfront while
+        datasets fetch any other property on demand.
+        """
 
-        if returncode != 0 and 'dataset does not exist' in errors:
-            return cls(datasets=[], side=side, config=config,)
-        if returncode != 0:
-            raise exception
+        root_dataset = root(config[side]["zpool"], config[side]["prefix"])
 
-        output = [
-            line.split("\t") for line in output.split("\n") if len(line.strip()) > 0
-        ]
-        entities = OrderedDict((line[0], []) for line in output)
-        for line_list in output:
-            entities[line_list[0]].append(line_list[1:])
+        if properties is None:
+            cmd = ["zfs", "get", "all", "-r", "-H", "-p", root_dataset]
+        else:
+            cmd = [
+                "zfs",
+                "list",
+                "-t",
+                "all",
+                "-r",
+                "-H",
+                "-p",
+                "-o",
+                ",".join(("name",) + properties),
+                root_dataset,
+            ]
+
+        lines = Command.on_side(cmd, side, config).run_stream()
+
+        try:
+            entities = cls._group_entities(
+                cls._parse_get(lines)
+                if properties is None
+                else cls._parse_list(lines, properties)
+            )
+        except CommandError as exception:
+            if "dataset does not exist" in exception.errors:
+                return cls(datasets=[], side=side, config=config,)
+            raise
 
         if not config.get("include_root", True):
             entities.pop(root_dataset)
-            for name in [
-                snapshot
-                for snapshot in entities.keys()
-                if snapshot.startswith(f"{root_dataset:s}@")
-            ]:
-                entities.pop(name)
 
         datasets = [
             Dataset.from_entities(
-                name,
-                OrderedDict(
-                    (k, v)
-                    for k, v in entities.items()
-                    if k == name or k.startswith(f"{name:s}@")
-                ),
-                side,
-                config,
+                name, dataset_entities, side, config, lazy=properties is not None,
             )
-            for name in entities.keys()
-            if "@" not in name
+            for name, dataset_entities in entities.items()
         ]
         datasets.sort(key=lambda dataset: dataset.name)
 
         return cls(datasets=datasets, side=side, config=config,)
+
+    @classmethod
+    def from_config_pair(
+        cls,
+        config: ConfigABC,
+        properties: typing.Union[None, typing.Tuple[str, ...]] = None,
+        available: bool = False,
+    ) -> typing.Tuple[ZpoolABC, ZpoolABC, typing.Union[None, int]]:
+        """
+        Loads the inventories of source and target concurrently. If `available` is
+        set, the available space on the source side is fetched alongside.
+        """
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            source = executor.submit(cls.from_config, "source", config, properties)
+            target = executor.submit(cls.from_config, "target", config, properties)
+            space = (
+                executor.submit(cls.available, "source", config) if available else None
+            )
+
+            return (
+                source.result(),
+                target.result(),
+                None if space is None else space.result(),
+            )
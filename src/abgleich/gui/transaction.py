@@ -59,27 +59,35 @@ class TransactionListModel(QAbstractTableModel):
 
     def data(
         self, index: QModelIndex, role: int
-    ) -> typing.Union[None, str, QColor]:  # TODO return type
+    ) -> typing.Union[None, str, int, float, QColor]:  # TODO return type
 
         row, col = index.row(), index.column()
         col_key = self._cols[col]
 
+        if col_key == t("progress"):
+            progress = self._transactions[row].progress
+            if role == Qt.DisplayRole and progress is not None:
+                return str(progress)
+            return
+
+        value = self._transactions[row].meta.get(col_key)
+
         if role == Qt.DisplayRole:
-            if col_key == t("written"):
-                return humanize_size(self._transactions[row].meta[col_key])
-            return self._transactions[row].meta[col_key]
+            if value is None:
+                return ""
+            if col_key in (t("size"), t("written")):
+                return humanize_size(value)
+            return value
 
         if role == Qt.ForegroundRole:
-            if col_key != t("written"):
+            if col_key not in (t("size"), t("written")) or value is None:
                 return
             return QColor("#808080")
 
         if role == Qt.BackgroundRole:
-            if col_key != t("written"):
+            if col_key not in (t("size"), t("written")) or value is None:
                 return
-            return QColor(
-                humanize_size(self._transactions[row].meta[col_key], get_rgb=True)
-            )
+            return QColor(humanize_size(value, get_rgb=True))
 
         if role == Qt.DecorationRole:
             if col_key != t("type"):
@@ -114,17 +122,39 @@ class TransactionListModel(QAbstractTableModel):
 
     def _transactions_changed(self, row: typing.Union[None, int] = None):
 
-        old_rows, old_cols = self._rows, self._cols
-        self._update_labels()
-        if old_rows != self._rows or old_cols != self._cols:
-            self.layoutChanged.emit()
+        if row is None or not self._labels_cover(row):
+            old_rows, old_cols = self._rows, self._cols
+            self._update_labels()
+            if old_rows != self._rows or old_cols != self._cols:
+                self.layoutChanged.emit()
         if row is not None:
             self.dataChanged.emit(
                 self.index(row, 0), self.index(row, len(self._cols) - 1)
             )
         self._parent_changed()
 
+    def _labels_cover(self, row: int) -> bool:
+        """
+        Whether the current labels already cover a transaction, so changes of it,
+        e.g. progress updates, do not require rescanning all transactions.
+        """
+
+        if len(self._rows) != len(self._transactions):
+            return False
+
+        transaction = self._transactions[row]
+        if transaction.progress is not None and t("progress") not in self._cols:
+            return False
+        return all((key in self._cols for key in transaction.meta.keys()))
+
     def _update_labels(self):
 
         self._rows = self._transactions.table_rows
         self._cols = self._transactions.table_columns
+        if any(
+            (
+                self._transactions[row].progress is not None
+                for row in range(len(self._transactions))
+            )
+        ):
+            self._cols.append(t("progress"))
@@ -37,9 +37,9 @@ from typeguard import typechecked
 from .transaction import TransactionListModel
 from .wizard_base import WizardUiBase
 from ..core.abc import ConfigABC
-from ..core.transaction import TransactionList
+from ..core.transaction import Transaction, TransactionList
 from ..core.i18n import t
-from ..core.zpool import Zpool
+from ..core.zpool import PROPERTIES, Zpool
 from .. import __version__
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -70,6 +70,8 @@ class WizardUi(WizardUiBase):
 
         self._continue = lambda: None
 
+        self._zpools = None  # inventories of source and target, if still current
+
         self._transactions = TransactionList()
         self._model = TransactionListModel(self._transactions, self._changed)
         self._ui["table"].setModel(self._model)
@@ -158,25 +160,29 @@ class WizardUi(WizardUiBase):
         self._ui["progress"].setMaximum(len(self._transactions))
         QApplication.processEvents()
 
-        for number, transaction in enumerate(self._transactions):
+        self._zpools = None  # outdated by transactions
 
-            assert not transaction.running
-            assert not transaction.complete
+        number = 0
+        for batch in self._transactions.batches:
 
-            transaction.run()
-            self._ui["progress"].setValue(number + 1)
+            assert not any((transaction.running for transaction in batch))
+            assert not any((transaction.complete for transaction in batch))
+
+            Transaction.run_batch(batch)
+            number += len(batch)
+            self._ui["progress"].setValue(number)
             QApplication.processEvents()
 
-            assert not transaction.running
-            assert transaction.complete
+            assert not any((transaction.running for transaction in batch))
+            assert all((transaction.complete for transaction in batch))
 
-            if transaction.error is not None:
+            if batch[0].error is not None:
                 QMessageBox.critical(
                     self,
                     t("Critical Error"),
                     t("Transaction failed!")
                     + "\n\n"
-                    + "\n\n".join([str(item) for item in transaction.error.args]),
+                    + "\n\n".join([str(item) for item in batch[0].error.args]),
                 )
                 self._quit()
                 return
@@ -201,7 +207,9 @@ class WizardUi(WizardUiBase):
 
     def _prepare_snap(self):
 
-        zpool = Zpool.from_config("source", config=self._config)
+        zpool = Zpool.from_config(
+            "source", config=self._config, properties=PROPERTIES["snap"]
+        )
 
         gen = zpool.generate_snapshot_transactions()
         length, _ = next(gen)
@@ -219,8 +227,14 @@ class WizardUi(WizardUiBase):
 
     def _prepare(self, action: str):
 
-        source_zpool = Zpool.from_config("source", config=self._config)
-        target_zpool = Zpool.from_config("target", config=self._config)
+        # Cleanup reuses inventories and comparison of backup if it had nothing to
+        # do. Properties of cleanup are a subset of those of backup.
+        if self._zpools is None:
+            source_zpool, target_zpool, _ = Zpool.from_config_pair(
+                config=self._config, properties=PROPERTIES[action]
+            )
+            self._zpools = source_zpool, target_zpool
+        source_zpool, target_zpool = self._zpools
 
         gen = getattr(source_zpool, f"generate_{action:s}_transactions")(target_zpool)
         length, _ = next(gen)
@@ -234,6 +248,11 @@ class WizardUi(WizardUiBase):
             self._ui["progress"].setValue(number + 1)
             QApplication.processEvents()
 
+        source_zpool.print_conflicts()
+
+        if action == "backup":
+            self._transactions.estimate(jobs=self._config["source"].get("jobs", 4))
+
         return len(self._transactions) > 0
 
     def _quit(self):
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_command.py: Streaming and relaying of command output
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import os
+
+import pytest
+
+from abgleich.core.command import RELAY_CHUNK, Command, CommandError
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+SIZE = 5 * RELAY_CHUNK + 12345  # several chunks, last one partial
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# FIXTURES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@pytest.fixture(params=["splice", "copy"])
+def relay(request, monkeypatch):
+    """
+    Runs a test with `os.splice` if available and with the copying fallback.
+    """
+
+    if request.param == "splice":
+        if not hasattr(os, "splice"):
+            pytest.skip("os.splice not available")
+    else:
+        monkeypatch.delattr(os, "splice", raising=False)
+
+    return request.param
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def test_run_pipe(relay, tmp_path):
+
+    data = os.urandom(SIZE)
+    (tmp_path / "in").write_bytes(data)
+    lengths = []
+
+    Command(["cat", str(tmp_path / "in")]).run_pipe(
+        Command(["sh", "-c", f'cat > "{str(tmp_path / "out"):s}"']),
+        progress=lengths.append,
+    )
+
+    assert (tmp_path / "out").read_bytes() == data
+    assert sum(lengths) == SIZE
+    assert all((length <= RELAY_CHUNK for length in lengths))
+
+
+def test_run_pipe_sender_fails(relay):
+
+    with pytest.raises(SystemError) as error:
+        Command(["sh", "-c", "printf data; echo broken >&2; exit 3"]).run_pipe(
+            Command(["cat"])
+        )
+
+    message, pipe, errors_1, output_2, errors_2 = error.value.args
+    assert (errors_1, output_2, errors_2) == ("broken\n", "data", "")
+
+
+def test_run_pipe_receiver_fails(relay):
+
+    with pytest.raises(SystemError) as error:
+        Command(["head", "-c", str(64 * RELAY_CHUNK), "/dev/zero"]).run_pipe(
+            Command(["sh", "-c", "head -c 1 > /dev/null; echo full >&2; exit 4"])
+        )
+
+    _, _, _, _, errors_2 = error.value.args
+    assert errors_2 == "full\n"
+
+
+def test_run_pipe_receiver_quits_silently(relay):
+
+    with pytest.raises(SystemError):  # sender is killed by SIGPIPE
+        Command(["head", "-c", str(64 * RELAY_CHUNK), "/dev/zero"]).run_pipe(
+            Command(["true"])
+        )
+
+
+def test_run_pipe_stderr_does_not_stall(relay):
+
+    noise = "yes noise | head -c 1000000 >&2"
+
+    with pytest.raises(SystemError) as error:  # stderr is not empty
+        Command(["sh", "-c", f"{noise:s}; printf data"]).run_pipe(
+            Command(["sh", "-c", f"{noise:s}; cat"])
+        )
+
+    _, _, errors_1, output_2, errors_2 = error.value.args
+    assert (len(errors_1), output_2, len(errors_2)) == (1000000, "data", 1000000)
+
+
+def test_run_stream():
+
+    lines = Command(["sh", "-c", "printf 'a\\n\\nb\\nlast'"]).run_stream(chunk_size=2)
+
+    assert list(lines) == [b"a", b"", b"b", b"last"]
+
+
+def test_run_stream_failure():
+
+    lines = Command(["sh", "-c", "echo a; yes noise | head -c 1000000 >&2; exit 2"])
+
+    with pytest.raises(CommandError) as error:
+        for _ in lines.run_stream():
+            pass
+
+    assert len(error.value.errors) == 1000000
+
+
+def test_run_stream_close(tmp_path):
+
+    pid = tmp_path / "pid"
+    lines = Command(["sh", "-c", f'echo $$ > "{str(pid):s}"; exec yes']).run_stream()
+
+    assert next(lines) == b"y"
+    lines.close()  # kills the command
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid.read_text()), 0)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_config.py: Validation of configuration files
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import copy
+import io
+import os
+import re
+
+import pytest
+import yaml
+
+from abgleich.core.config import Config
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+BASE = {
+    "source": {"zpool": "tank", "prefix": None, "host": "localhost", "user": None},
+    "target": {"zpool": "backup", "prefix": None, "host": "localhost", "user": None},
+    "keep_snapshots": 2,
+    "suffix": "_backup",
+    "digits": 2,
+    "ignore": [],
+    "ssh": {"compression": False, "cipher": None},
+}
+README = os.path.join(os.path.dirname(__file__), os.pardir, "README.md")
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def _load(**fields):
+    """
+    Loads the base configuration with fields replaced, e.g. `ssh__multiplex` for
+    `multiplex` in section `ssh`.
+    """
+
+    config = copy.deepcopy(BASE)
+    for name, value in fields.items():
+        section, _, field = name.rpartition("__")
+        (config if len(section) == 0 else config.setdefault(section, {}))[field] = value
+
+    return Config.from_fd(io.StringIO(yaml.dump(config)))
+
+
+def test_base():
+
+    assert _load()["keep_snapshots"] == 2
+
+
+def test_readme_example():
+
+    with open(README, "r", encoding="utf-8") as f:
+        example = re.search(r"```yaml\n(.*?)```", f.read(), re.DOTALL).group(1)
+
+    Config.from_fd(io.StringIO(example))
+
+
+def test_missing():
+
+    config = copy.deepcopy(BASE)
+    config.pop("digits")
+
+    with pytest.raises(KeyError):
+        Config.from_fd(io.StringIO(yaml.dump(config)))
+
+
+@pytest.mark.parametrize(
+    "fields, valid",
+    [
+        ({"ssh__multiplex": True}, True),
+        ({"ssh__multiplex": False}, True),
+        ({"ssh__multiplex": "yes please"}, False),
+        ({"ssh__multiplex": 1}, False),
+        ({"defer_destroy": True}, True),
+        ({"defer_destroy": "no"}, False),
+        ({"send_intermediary": False}, True),
+        ({"send_intermediary": None}, False),
+        ({"probe_size": 0}, True),
+        ({"probe_size": 16777216}, True),
+        ({"probe_size": -1}, False),
+        ({"probe_size": "16M"}, False),
+        ({"jobs": 4}, True),
+        ({"jobs": 0}, False),
+        ({"jobs": -2}, False),
+        ({"jobs": True}, False),
+        ({"source__jobs": 2, "target__jobs": 8}, True),
+        ({"source__jobs": 0}, False),
+        ({"target__jobs": "4"}, False),
+        ({"comparison_backend": "python"}, True),
+        ({"comparison_backend": "numpy"}, True),
+        ({"comparison_backend": "nunpy"}, False),
+        ({"comparison_backend": None}, False),
+        ({"comparison_backend": ["numpy"]}, False),
+        ({"transfer__transport": "tcp", "transfer__port": 9000}, True),
+        ({"transfer__transport": "udp"}, False),
+        ({"transfer__topology": "direct"}, True),
+        ({"transfer__topology": "star"}, False),
+        ({"transfer__compression": "zstd", "transfer__compression_level": 3}, True),
+        ({"transfer__compression": False}, True),
+        ({"transfer__compression": "gzip"}, False),
+        ({"transfer__compression_threads": -1}, False),
+        ({"transfer__compression_skip_ratio": 1}, True),
+        ({"transfer__compression_skip_ratio": "1.5"}, False),
+        ({"transfer__port": 70000}, False),
+        ({"transfer__buffer": 1024}, False),
+        ({"transfer": "tcp"}, False),
+        ({"send_profiles": {"media": {"datasets": ["media/*"], "flags": []}}}, True),
+        ({"send_profiles": {"default": {"flags": ["raw", "large-block"]}}}, True),
+        ({"send_profiles": {"media": {"flags": ["-L"]}}}, False),
+        ({"send_profiles": {"media": {"flags": "raw"}}}, False),
+        ({"send_profiles": {"media": {"datasets": "media"}}}, False),
+        ({"send_profiles": {"media": None}}, False),
+        ({"send_profiles": ["media"]}, False),
+    ],
+)
+def test_optional(fields, valid):
+
+    if valid:
+        _load(**fields)
+        return
+
+    with pytest.raises(ValueError):
+        _load(**fields)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_conflict.py: Datasets whose snapshots have diverged
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from collections import OrderedDict
+import os
+
+import pytest
+
+from abgleich.core.config import Config
+from abgleich.core.dataset import Dataset
+from abgleich.core.i18n import t
+from abgleich.core.vector import np
+from abgleich.core.zpool import COMPARISON_BACKENDS, Zpool
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+BASE = {
+    "source": {"zpool": "tank", "prefix": None, "host": "localhost", "user": None},
+    "target": {"zpool": "backup", "prefix": None, "host": "localhost", "user": None},
+    "keep_snapshots": 1,
+    "ignore": [],
+}
+ROOTS = {"source": "tank", "target": "backup"}
+
+# Snapshots of dataset "bad" on source and target, and whether cleanup is affected
+CASES = {
+    "guid mismatch": ([1, 2, 3], [1, (2, 9999)], True),
+    "gap": ([1, 2, 4], [1, 2, 3], True),
+    "target-only head": ([1, 2], [1, 2, 3], False),
+    "no overlap": ([3, 4], [1, 2], True),
+}
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# FIXTURES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@pytest.fixture(params=["python", "numpy"])
+def config(request, tmp_path, monkeypatch):
+    """
+    Configuration with either comparison backend. A stand-in for `zfs` fails
+    dry runs, so sizes of transfers are not estimated.
+    """
+
+    if request.param == "numpy" and np is None:
+        pytest.skip("numpy not available")
+
+    path = tmp_path / "zfs"
+    path.write_text("#!/bin/sh\nexit 1\n")
+    path.chmod(0o755)
+    monkeypatch.setenv("PATH", f'{str(tmp_path):s}{os.pathsep:s}{os.environ["PATH"]:s}')
+
+    return Config({**BASE, "comparison_backend": request.param})
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def _dataset(config, side, subname, snapshots):
+    """
+    Snapshots are given by index, or by index and GUID if it differs.
+    """
+
+    name = ROOTS[side] if len(subname) == 0 else f"{ROOTS[side]:s}/{subname:s}"
+
+    entities = OrderedDict()
+    entities[name] = [["type", "filesystem", "-"], ["encryption", "off", "-"]]
+    for snapshot in snapshots:
+        index, guid = snapshot if isinstance(snapshot, tuple) else (snapshot, None)
+        entities[f"{name:s}@s{index:d}"] = [
+            ["type", "snapshot", "-"],
+            ["guid", str(1000 + index if guid is None else guid), "-"],
+            ["createtxg", str(100 + index), "-"],
+            ["written", str(1024 * index), "-"],
+        ]
+
+    return Dataset.from_entities(name, entities, side, config)
+
+
+def _zpools(config, source, target):
+
+    return tuple(
+        Zpool(
+            [
+                _dataset(config, side, subname, snapshots)
+                for subname, snapshots in datasets.items()
+            ],
+            side,
+            config,
+        )
+        for side, datasets in (("source", source), ("target", target))
+    )
+
+
+def _subnames(transactions, key):
+
+    return {transaction.meta[t(key)] for transaction in transactions}
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_backup(config, case):
+
+    bad_source, bad_target, _ = CASES[case]
+    source, target = _zpools(
+        config,
+        {"": [1, 2, 3], "bad": bad_source, "ok": [1, 2, 3]},
+        {"": [1, 2], "bad": bad_target, "ok": [1]},
+    )
+
+    transactions = source.get_backup_transactions(target)
+
+    assert list(source.conflicts.keys()) == ["bad"]
+    assert _subnames(transactions, "snapshot_subparent") == {"", "ok"}
+    assert len(transactions) == 3
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_cleanup(config, case):
+
+    bad_source, bad_target, affected = CASES[case]
+    source, target = _zpools(
+        config,
+        {"": [1, 2, 3], "bad": bad_source, "ok": [1, 2, 3]},
+        {"": [1, 2], "bad": bad_target, "ok": [1, 2, 3]},
+    )
+
+    transactions = source.get_cleanup_transactions(target)
+
+    assert list(source.conflicts.keys()) == (["bad"] if affected else [])
+    assert _subnames(transactions, "snapshot_subparent") == (
+        {"", "ok"} if affected else {"", "bad", "ok"}
+    )
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_comparison_table(config, case, capsys):
+
+    bad_source, bad_target, _ = CASES[case]
+    source, target = _zpools(
+        config,
+        {"": [1, 2, 3], "bad": bad_source, "new": [1, 2]},
+        {"": [1], "bad": bad_target, "old": [1]},
+    )
+
+    source.print_comparison_table(target)
+
+    output = capsys.readouterr().out
+    assert t("conflict") in output
+    assert output.splitlines()[-1].endswith("8.0 KiB\x1b[0;0m")  # 5 KiB + 3 KiB
+
+
+def test_no_snapshots_on_source(config):
+
+    source, target = _zpools(
+        config, {"": [1, 2], "empty": [], "new": []}, {"": [1], "empty": [1]}
+    )
+
+    transactions = source.get_backup_transactions(target)
+
+    assert list(source.conflicts.keys()) == ["empty"]
+    assert len(transactions) == 1  # s2 of "", "new" has nothing to send
+
+
+def test_shared_comparison(config, monkeypatch):
+
+    backend = COMPARISON_BACKENDS[config["comparison_backend"]]
+    from_datasets = backend.from_datasets
+    compared = []
+
+    def counted(cls, dataset_a, dataset_b):
+        compared.append(dataset_a.subname)
+        return from_datasets(dataset_a, dataset_b)
+
+    monkeypatch.setattr(backend, "from_datasets", classmethod(counted))
+
+    source, target = _zpools(
+        config,
+        {"": [1, 2, 3], "bad": [1, 2], "ok": [1, 2, 3]},
+        {"": [1, 2], "bad": [1, 2, 3], "ok": [1, 2, 3]},
+    )
+
+    comparison = source.get_comparison(target)
+    source.get_backup_transactions(target)
+    assert sorted(compared) == ["", "bad"]  # "ok" is in sync
+    assert list(source.conflicts.keys()) == ["bad"]
+
+    transactions = source.get_cleanup_transactions(target)
+    assert source.get_comparison(target) is comparison
+    assert sorted(compared) == ["", "bad", "ok"]  # each pair compared once
+    assert len(source.conflicts) == 0  # of cleanup only
+    assert len(transactions) == 3
+
+    _, reloaded = _zpools(config, {}, {"": [1, 2], "bad": [1, 2, 3], "ok": [1]})
+    assert source.get_comparison(reloaded) is not comparison
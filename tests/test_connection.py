@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_connection.py: Connections and commands run through them
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import os
+import shlex
+import subprocess
+import sys
+
+import pytest
+
+from abgleich.core.command import Command, CommandError
+from abgleich.core.connection import (
+    LocalConnection,
+    SSHConnection,
+    close_connections,
+    get_connection,
+)
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+SIDE = {"host": "example.org", "user": "backup"}
+SSH = {"compression": False, "cipher": None}
+
+# Logs its arguments, one call per line, and exits with $FAKESSH_STATUS
+FAKE_SSH = """#!/bin/sh
+printf '%s\\n' "$*" >> "$FAKESSH_LOG"
+exit "${FAKESSH_STATUS:-0}"
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# FIXTURES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@pytest.fixture
+def fake_ssh(tmp_path, monkeypatch):
+
+    path = tmp_path / "ssh"
+    path.write_text(FAKE_SSH)
+    path.chmod(0o755)
+    log = tmp_path / "ssh.log"
+    log.write_text("")
+
+    monkeypatch.setenv("PATH", f'{str(tmp_path):s}{os.pathsep:s}{os.environ["PATH"]:s}')
+    monkeypatch.setenv("FAKESSH_LOG", str(log))
+
+    yield lambda: log.read_text().splitlines()
+
+    close_connections()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def test_local_run():
+
+    connection = LocalConnection("source")
+    output, errors = Command(["echo", "a b"], connection).run()
+
+    assert (output, errors) == ("a b\n", "")
+    assert connection.connected
+
+
+def test_local_run_failure():
+
+    with pytest.raises(CommandError) as error:
+        Command(["sh", "-c", "echo oops >&2; exit 3"], LocalConnection("source")).run()
+
+    assert error.value.errors == "oops\n"
+
+
+def test_local_run_stream():
+
+    lines = Command(["printf", "a\\nb\\nc"], LocalConnection("source")).run_stream()
+
+    assert list(lines) == [b"a", b"b", b"c"]
+
+
+def test_local_run_pipe():
+
+    send = Command(["printf", "payload"], LocalConnection("source"))
+    receive = Command(["sh", "-c", "cat; echo ' received'"], LocalConnection("target"))
+
+    assert send.run_pipe(receive) == ("", "payload received\n", "")
+
+
+def test_wrap_quotes():
+
+    connection = SSHConnection("source", SIDE, SSH)
+    cmd = ["zfs", "send", "tank/my data@it's", 'tank/"quoted"', "$HOME;*"]
+
+    wrapped = connection.wrap(cmd)
+
+    assert wrapped == [
+        "ssh",
+        "-T",
+        "-o",
+        "Compression=no",
+        "backup@example.org",
+        "zfs send 'tank/my data@it'\"'\"'s' 'tank/\"quoted\"' '$HOME;*'",
+    ]
+    assert shlex.split(wrapped[-1]) == cmd
+
+
+def test_wrap_options():
+
+    connection = SSHConnection(
+        "source", SIDE, {"compression": True, "cipher": "aes128-gcm@openssh.com"}
+    )
+
+    assert connection.wrap(["zfs", "list"]) == [
+        "ssh",
+        "-T",
+        "-o",
+        "Compression=yes",
+        "-c",
+        "aes128-gcm@openssh.com",
+        "backup@example.org",
+        "zfs list",
+    ]
+
+
+def test_multiplex(fake_ssh):
+
+    connection = SSHConnection("source", SIDE, SSH, multiplex=True)
+    assert "ControlPath" not in " ".join(connection.wrap(["true"]))  # not open yet
+
+    connection.connect()
+    connection.connect()  # only once
+    assert connection.connected
+    socket = connection._socket
+    assert os.path.isdir(os.path.dirname(socket))
+    (master,) = fake_ssh()
+    assert "-o ControlMaster=yes" in master
+    assert f"-o ControlPath={socket:s}" in master
+    assert master.endswith("-N -f backup@example.org")
+
+    wrapped = connection.wrap(["zfs", "list"])
+    assert wrapped[-6:] == [
+        "-o",
+        "ControlMaster=no",
+        "-o",
+        f"ControlPath={socket:s}",
+        "backup@example.org",
+        "zfs list",
+    ]
+    assert "ControlPath" not in " ".join(connection.wrap(["true"], shared=False))
+
+    connection.disconnect()
+    assert not connection.connected
+    assert fake_ssh()[-1] == f"-o ControlPath={socket:s} -O exit backup@example.org"
+    assert not os.path.exists(os.path.dirname(socket))
+
+
+def test_multiplex_failure(fake_ssh, monkeypatch):
+
+    monkeypatch.setenv("FAKESSH_STATUS", "255")
+    connection = SSHConnection("source", SIDE, SSH, multiplex=True)
+
+    connection.connect()
+    connection.connect()  # not retried
+
+    assert not connection.connected
+    assert len(fake_ssh()) == 1
+    assert "ControlPath" not in " ".join(connection.wrap(["true"]))
+
+
+def test_no_multiplex(fake_ssh):
+
+    connection = SSHConnection("source", SIDE, SSH, multiplex=False)
+    output, _ = Command(["zfs", "list"], connection).run()
+
+    assert output == ""
+    assert fake_ssh() == ["-T -o Compression=no backup@example.org zfs list"]
+
+
+def test_registry(fake_ssh):
+
+    config = {
+        "source": {"host": "localhost", "user": None},
+        "target": SIDE,
+        "ssh": {**SSH, "multiplex": True},
+    }
+
+    source = get_connection("source", config)
+    target = get_connection("target", config)
+
+    assert isinstance(source, LocalConnection)
+    assert isinstance(target, SSHConnection)
+    assert get_connection("source", config) is source
+    assert get_connection("target", config) is target
+
+    target.connect()
+    assert target.connected
+
+    close_connections()
+    assert not target.connected
+    assert fake_ssh()[-1].endswith("-O exit backup@example.org")
+    assert get_connection("target", config) is not target
+
+
+def test_close_at_exit(fake_ssh):
+
+    script = (
+        "from abgleich.core.connection import get_connection\n"
+        "config = {'target': {'host': 'example.org', 'user': 'backup'},\n"
+        "          'ssh': {'compression': False, 'cipher': None}}\n"
+        "get_connection('target', config).connect()\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+    master, close = fake_ssh()
+    assert "ControlMaster=yes" in master
+    assert close.endswith("-O exit backup@example.org")
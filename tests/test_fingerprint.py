@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_fingerprint.py: Fingerprints of datasets in sync
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from collections import OrderedDict
+
+from abgleich.core.config import Config
+from abgleich.core.dataset import Dataset
+from abgleich.core.zpool import Zpool
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+CONFIG = Config(
+    {
+        "source": {"zpool": "tank", "prefix": None, "host": "localhost", "user": None},
+        "target": {
+            "zpool": "backup",
+            "prefix": None,
+            "host": "localhost",
+            "user": None,
+        },
+    }
+)
+ROOTS = {"source": "tank", "target": "backup"}
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def _dataset(side, subname, snapshots, token=None):
+
+    name = ROOTS[side] if len(subname) == 0 else f"{ROOTS[side]:s}/{subname:s}"
+
+    entities = OrderedDict()
+    entities[name] = [["type", "filesystem", "-"]]
+    if token is not None:
+        entities[name].append(["receive_resume_token", token, "-"])
+    for index in snapshots:
+        entities[f"{name:s}@s{index:d}"] = [
+            ["type", "snapshot", "-"],
+            ["guid", str(1000 + index), "-"],
+            ["createtxg", str(100 + index), "-"],
+        ]
+
+    return Dataset.from_entities(name, entities, side, CONFIG)
+
+
+def _zpools(source, target, tokens=None):
+
+    tokens = {} if tokens is None else tokens
+
+    return (
+        Zpool(
+            [
+                _dataset("source", subname, snapshots)
+                for subname, snapshots in source.items()
+            ],
+            "source",
+            CONFIG,
+        ),
+        Zpool(
+            [
+                _dataset("target", subname, snapshots, tokens.get(subname, None))
+                for subname, snapshots in target.items()
+            ],
+            "target",
+            CONFIG,
+        ),
+    )
+
+
+def test_in_sync_after_cleanup():
+
+    source, target = _zpools({"": [8, 9]}, {"": list(range(10))})
+
+    assert source.get_fingerprint("") == target.get_fingerprint("")
+    assert source._in_sync(target, "")
+
+
+def test_not_in_sync_with_new_snapshot():
+
+    source, target = _zpools({"": [8, 9, 10]}, {"": list(range(10))})
+
+    assert source.get_fingerprint("") != target.get_fingerprint("")
+    assert not source._in_sync(target, "")
+
+
+def test_not_in_sync_with_resume_token():
+
+    source, target = _zpools({"": [8, 9]}, {"": list(range(10))}, {"": "1-abc"})
+
+    assert not source._in_sync(target, "")
+
+
+def test_subtree():
+
+    source, target = _zpools(
+        {"": [8, 9], "a": [5, 6], "a/b": [7], "c": [1, 2]},
+        {"": list(range(10)), "a": [6], "a/b": [3, 7], "c": [1]},
+    )
+
+    assert source._in_sync(target, "a/b")
+    assert source.get_fingerprint("a") == target.get_fingerprint("a")
+    assert source.get_fingerprint("") != target.get_fingerprint("")  # "c"
+    assert not source._in_sync(target, "c")
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_scheduler.py: Ordering and limits of concurrent transactions
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from collections import Counter
+import threading
+import time
+
+import pytest
+
+from abgleich.core.command import Command
+from abgleich.core.config import Config
+from abgleich.core.connection import SSHConnection
+from abgleich.core.i18n import t
+from abgleich.core.scheduler import Scheduler
+from abgleich.core.transaction import Transaction, TransactionMeta
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+DURATION = 0.05  # seconds per fake transaction
+SSH = {"compression": False, "cipher": None}
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASSES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+class Recorder:
+    """
+    Shared log of fake transactions: order of starts and finishes as well as
+    the maximum number of concurrently running transactions, per host and total.
+    """
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self.events = []
+        self.load = Counter()
+        self.peak = Counter()
+
+    def start(self, name: str, hosts: tuple):
+
+        with self._lock:
+            self.events.append(("start", name))
+            self.load.update(hosts + ("*",))
+            for host in hosts + ("*",):
+                self.peak[host] = max(self.peak[host], self.load[host])
+
+    def finish(self, name: str, hosts: tuple):
+
+        with self._lock:
+            self.events.append(("finish", name))
+            self.load.subtract(hosts + ("*",))
+
+    def position(self, event: str, name: str) -> int:
+
+        return self.events.index((event, name))
+
+    def before(self, first: str, second: str) -> bool:
+        """
+        `first` finished before `second` started.
+        """
+
+        return self.position("finish", first) < self.position("start", second)
+
+
+class FakeTransaction(Transaction):
+    """
+    Sleeps instead of running its command and reports to a recorder.
+    """
+
+    def __init__(self, recorder: Recorder, name: str, fail: bool = False, **kwargs):
+
+        super().__init__(**kwargs)
+        self._recorder, self._name, self._fail = recorder, name, fail
+
+    def run(self):
+
+        hosts = tuple({command.connection.host for command in self.commands})
+
+        self._start()
+        self._recorder.start(self._name, hosts)
+        time.sleep(DURATION)
+        self._recorder.finish(self._name, hosts)
+        if self._fail:
+            self._error = SystemError("failed", self._name)
+        self._finish()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def _batch(recorder, name, dataset=None, hosts=("source",), snapshot=False, fail=False):
+    """
+    Batch of one fake transaction named `name`. It belongs to `dataset` (a
+    barrier if `None`) and has one command per host in `hosts`.
+    """
+
+    meta = {t("type"): "test"}
+    if dataset is not None:
+        meta[t("snapshot_subparent" if snapshot else "dataset_subname")] = dataset
+
+    commands = [
+        Command(
+            ["true", name], SSHConnection("source", {"host": host, "user": None}, SSH)
+        )
+        for host in hosts
+    ]
+
+    return [
+        FakeTransaction(
+            recorder, name, fail=fail, meta=TransactionMeta(**meta), commands=commands
+        )
+    ]
+
+
+def test_dataset_order():
+
+    recorder = Recorder()
+    batches = []
+    for index in range(3):
+        for dataset in ("a", "b", "c"):
+            batches.append(
+                _batch(recorder, f"{dataset:s}{index:d}", dataset, snapshot=index > 0)
+            )
+
+    Scheduler(jobs=4).run_stream(batches)
+
+    for dataset in ("a", "b", "c"):
+        assert recorder.before(f"{dataset:s}0", f"{dataset:s}1")
+        assert recorder.before(f"{dataset:s}1", f"{dataset:s}2")
+    assert recorder.peak["*"] == 3  # datasets run side by side
+
+
+def test_parent_before_child():
+
+    recorder = Recorder()
+    batches = [
+        _batch(recorder, "a/b", "a/b"),  # child first, no parent queued yet
+        _batch(recorder, "a", "a"),
+        _batch(recorder, "a/c", "a/c"),
+        _batch(recorder, "a/c/d", "a/c/d"),
+        _batch(recorder, "a/c@1", "a/c", snapshot=True),
+        _batch(recorder, "e", "e"),
+    ]
+
+    Scheduler(jobs=8).run_stream(batches)
+
+    assert recorder.before("a", "a/c")
+    assert recorder.before("a/c", "a/c/d")
+    assert recorder.before("a/c", "a/c@1")
+    assert not recorder.before("a", "a/b")  # not in order of arrival
+    assert not recorder.before("a", "e")  # unrelated
+    assert not recorder.before("a/c/d", "a/c@1")  # snapshot needs no children
+
+
+def test_barrier():
+
+    recorder = Recorder()
+    batches = [
+        _batch(recorder, "a", "a"),
+        _batch(recorder, "b", "b"),
+        _batch(recorder, "barrier"),
+        _batch(recorder, "c", "c"),
+        _batch(recorder, "a@1", "a", snapshot=True),
+    ]
+
+    Scheduler(jobs=4).run_stream(batches)
+
+    for name in ("a", "b"):
+        assert recorder.before(name, "barrier")
+    for name in ("c", "a@1"):
+        assert recorder.before("barrier", name)
+
+
+@pytest.mark.parametrize(
+    "jobs, host_jobs, reached",
+    [
+        (8, {"source": 2}, ("source", "*")),
+        (3, {"source": 4, "target": 4}, ("*",)),
+        (8, {"source": 1, "target": 3}, ("source", "target")),
+    ],
+)
+def test_limits(jobs, host_jobs, reached):
+
+    recorder = Recorder()
+    batches = []
+    for index in range(12):
+        for hosts in (("source",), ("target",)):
+            name = f"{hosts[0]:s}{index:d}"
+            batches.append(_batch(recorder, name, name, hosts=hosts))
+
+    Scheduler(jobs=jobs, host_jobs=host_jobs).run_stream(batches)
+
+    assert len(recorder.events) == 2 * 24
+    limits = {"source": jobs, "target": jobs, **host_jobs, "*": jobs}
+    for host, limit in limits.items():
+        assert recorder.peak[host] <= limit
+    for host in reached:
+        assert recorder.peak[host] == limits[host]
+
+
+def test_limits_of_transfers():
+
+    recorder = Recorder()
+    batches = [
+        _batch(recorder, f"d{index:d}", f"d{index:d}", hosts=("source", "target"))
+        for index in range(6)
+    ]
+
+    Scheduler(jobs=8, host_jobs={"source": 4, "target": 2}).run_stream(batches)
+
+    assert recorder.peak == Counter({"source": 2, "target": 2, "*": 2})
+
+
+def test_failure_stops():
+
+    recorder = Recorder()
+    batches = [
+        _batch(recorder, "a", "a", fail=True),
+        _batch(recorder, "a@1", "a", snapshot=True),
+        _batch(recorder, "b", "b"),
+    ]
+
+    with pytest.raises(SystemError):
+        Scheduler(jobs=2).run_stream(batches)
+
+    assert ("start", "a@1") not in recorder.events
+
+
+def test_from_config():
+
+    config = Config(
+        {
+            "source": {"host": "localhost", "jobs": 3},
+            "target": {"host": "localhost"},
+            "jobs": 6,
+        }
+    )
+
+    scheduler = Scheduler.from_config(config)
+
+    assert scheduler._jobs == 6
+    assert scheduler._host_jobs == {"localhost": 3}
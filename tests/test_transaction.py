@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_transaction.py: Lists of transactions
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+from abgleich.core.command import Command
+from abgleich.core.i18n import t
+from abgleich.core.transaction import Transaction, TransactionList, TransactionMeta
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def _transaction():
+
+    return Transaction(
+        meta=TransactionMeta(**{t("type"): "test"}), commands=[Command(["true"])]
+    )
+
+
+def test_changed_rows():
+
+    rows = []
+    transactions = TransactionList()
+    transactions.changed = lambda row=None: rows.append(row)
+
+    first = _transaction()
+    transactions.append(first)
+    rest = [_transaction() for _ in range(3)]
+    transactions.extend(rest)
+    assert rows == [0, 1, 2, 3]  # reported once when linked
+
+    rows.clear()
+    rest[1].changed()
+    first.changed()
+    rest[2].changed()
+    assert rows == [2, 0, 3]
+
+
+def test_changed_after_clear():
+
+    rows = []
+    transactions = TransactionList()
+    transactions.changed = lambda row=None: rows.append(row)
+
+    old = _transaction()
+    transactions.append(old)
+    transactions.clear()
+    assert old.changed is None
+
+    new = _transaction()
+    transactions.append(new)
+    rows.clear()
+    new.changed()
+    assert rows == [0]
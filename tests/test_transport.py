@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_transport.py: Data channels of backups
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import os
+
+import pytest
+
+from abgleich.core.config import Config
+from abgleich.core.transport import Transport
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CONSTANTS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+CONFIG = {
+    "source": {"host": "localhost", "user": None},
+    "target": {"host": "localhost", "user": None},
+    "transfer": {"transport": "tcp", "address": "127.0.0.1"},
+}
+
+# Usage printed by `nc -h` of OpenBSD and GNU netcat, abbreviated
+USAGE = {
+    "openbsd": (
+        "OpenBSD netcat (Debian patchlevel 1.219-1)\n"
+        "usage: nc [-46CDdFhklNnrStUuvZz] [-I length] [-i interval]\n"
+        "\t-l\t\tListen mode, for inbound connects\n"
+        "\t-N\t\tShutdown the network socket after EOF on stdin\n"
+        "\t-n\t\tSuppress name/port resolutions\n"
+    ),
+    "gnu": (
+        "GNU netcat 0.7.1, a rewrite of the famous networking tool.\n"
+        "  -l, --listen               listen mode, for inbound connects\n"
+        "  -n, --dont-resolve         numeric-only IP addresses, no DNS\n"
+    ),
+}
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# FIXTURES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+@pytest.fixture
+def netcat(tmp_path, monkeypatch):
+    """
+    Installs a stand-in for `nc` printing the usage of the given variant.
+    Returns the number of times the usage was requested.
+    """
+
+    monkeypatch.setattr(Transport, "_netcat", {})
+    monkeypatch.setenv("PATH", f'{str(tmp_path):s}{os.pathsep:s}{os.environ["PATH"]:s}')
+
+    def install(variant: str):
+        (tmp_path / "usage").write_text(USAGE[variant])
+        path = tmp_path / "nc"
+        path.write_text(
+            f'#!/bin/sh\necho >> "{str(tmp_path / "calls"):s}"\n'
+            f'cat "{str(tmp_path / "usage"):s}" >&2\nexit 1\n'
+        )
+        path.chmod(0o755)
+        return lambda: len((tmp_path / "calls").read_text())
+
+    return install
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def test_netcat_openbsd(netcat):
+
+    calls = netcat("openbsd")
+
+    transport = Transport.from_config(Config(CONFIG))
+    Transport.from_config(Config(CONFIG))
+
+    assert str(transport) == "tcp"
+    assert calls() == 1  # checked once per host
+
+
+def test_netcat_incompatible(netcat):
+
+    netcat("gnu")
+
+    with pytest.raises(ValueError) as error:
+        Transport.from_config(Config(CONFIG))
+
+    assert "OpenBSD netcat" in str(error.value)
+
+
+def test_netcat_not_needed(netcat):
+
+    netcat("gnu")
+
+    Transport.from_config(Config({**CONFIG, "transfer": {"transport": "ssh"}}))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ABGLEICH
+zfs sync tool
+https://github.com/pleiszenburg/abgleich
+
+    tests/test_vector.py: Agreement of comparison backends
+
+    Copyright (C) 2019-2020 Sebastian M. Ernst <ernst@pleiszenburg.de>
+
+<LICENSE_BLOCK>
+The contents of this file are subject to the GNU Lesser General Public License
+Version 2.1 ("LGPL" or "License"). You may not use this file except in
+compliance with the License. You may obtain a copy of the License at
+https://www.gnu.org/licenses/old-licenses/lgpl-2.1.txt
+https://github.com/pleiszenburg/abgleich/blob/master/LICENSE
+
+Software distributed under the License is distributed on an "AS IS" basis,
+WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License for the
+specific language governing rights and limitations under the License.
+</LICENSE_BLOCK>
+
+"""
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# IMPORT
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from abgleich.core.abc import DatasetABC, SnapshotABC
+from abgleich.core.comparison import Comparison
+from abgleich.core.vector import VectorComparison
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# CLASS
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+class _Property:
+    def __init__(self, value):
+
+        self.value = value
+
+
+class _Snapshot(SnapshotABC):
+    def __init__(self, name, guid, size=0):
+
+        self.name, self.guid, self._size = name, guid, size
+
+    def __getitem__(self, name):
+
+        assert name == "written"
+        return _Property(self._size)
+
+
+class _Dataset(DatasetABC):
+    def __init__(self, snapshots):
+
+        self._snapshots = snapshots
+
+    def __eq__(self, other):
+
+        return True
+
+    def __hash__(self):
+
+        return 0
+
+    @property
+    def snapshots(self):
+
+        return (snapshot for snapshot in self._snapshots)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# ROUTINES
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+
+def _outcome(function):
+
+    try:
+        return "ok", function()
+    except (ValueError, AssertionError) as error:
+        return "error", type(error).__name__, str(error)
+
+
+def _summary(comparison):
+
+    summary = {"merged": _outcome(lambda: [(i.a, i.b) for i in comparison.merged])}
+    for name in ("a_head", "b_head", "a_overlap_tail", "b_overlap_tail"):
+        summary[name] = _outcome(lambda: getattr(comparison, name))
+    for selection in Comparison.SELECTIONS:
+        summary[("written", selection)] = _outcome(
+            lambda: comparison.get_sum("written", selection)
+        )
+
+    return summary
+
+
+def _side(rnd, base):
+    """
+    Random excerpt of a snapshot series, possibly with a gap, swapped or
+    duplicate snapshots, a renamed snapshot or a snapshot with another GUID.
+    """
+
+    if len(base) == 0:
+        return []
+
+    start = rnd.randint(0, len(base))
+    snapshots = base[start : rnd.randint(start, len(base))]
+    if len(snapshots) < 2:
+        return snapshots
+
+    choice = rnd.random()
+    known = snapshots[0].guid is not None
+    index = rnd.randrange(len(snapshots))
+    if choice < 0.1:
+        return snapshots[:1] + snapshots[2:]
+    if choice < 0.15:
+        return [snapshots[1], snapshots[0]] + snapshots[2:]
+    if choice < 0.2:
+        return snapshots + [snapshots[0]]
+    if choice < 0.3 and known:
+        renamed = _Snapshot(
+            f"r{snapshots[index].name:s}", snapshots[index].guid, snapshots[index]._size
+        )
+        return snapshots[:index] + [renamed] + snapshots[index + 1 :]
+    if choice < 0.35 and known:
+        other = _Snapshot(
+            snapshots[index].name, snapshots[index].guid + 1, snapshots[index]._size
+        )
+        return snapshots[:index] + [other] + snapshots[index + 1 :]
+    return snapshots
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_agreement(seed):
+
+    rnd = random.Random(seed)
+
+    for _ in range(500):
+        guids = rnd.random() < 0.8
+        base = [
+            _Snapshot(
+                f"s{index:d}",
+                2**63 + index * 7919 if guids else None,
+                rnd.randrange(2**40),
+            )
+            for index in range(rnd.randint(0, 12))
+        ]
+        a, b = _side(rnd, base), _side(rnd, base)
+        dataset_a = None if rnd.random() < 0.05 else _Dataset(a)
+        dataset_b = (
+            None if dataset_a is not None and rnd.random() < 0.05 else _Dataset(b)
+        )
+
+        expected = _outcome(
+            lambda: _summary(Comparison.from_datasets(dataset_a, dataset_b))
+        )
+        actual = _outcome(
+            lambda: _summary(VectorComparison.from_datasets(dataset_a, dataset_b))
+        )
+
+        assert actual == expected, (
+            [(snapshot.name, snapshot.guid) for snapshot in a],
+            [(snapshot.name, snapshot.guid) for snapshot in b],
+        )